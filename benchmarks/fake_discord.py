@@ -0,0 +1,437 @@
+import asyncio
+import itertools
+import json
+import random
+import time
+from collections import Counter
+
+import aiohttp
+from aiohttp import web
+
+DISCORD_EPOCH = 1420070400000
+API_PREFIX = "/api/v10"
+
+# Permission bits granted to the fake bot and moderators
+ADMINISTRATOR = 1 << 3
+MUTE_MEMBERS = 1 << 22
+
+# Bucket size used when no rate limit is configured
+UNLIMITED = 1000000
+
+
+def json_response(data, status=200, headers=None):
+    # discord.py only decodes bodies whose content type is exactly application/json
+    return web.Response(body=json.dumps(data).encode("utf-8"), status=status,
+                        headers=dict(headers or {}, **{"Content-Type": "application/json"}))
+
+
+def install(port):
+    """Point discord.py's REST and gateway clients at a FakeDiscord listening on port"""
+    import yarl
+    from discord.gateway import DiscordWebSocket
+    from discord.http import Route
+
+    Route.BASE = f"http://127.0.0.1:{port}{API_PREFIX}"
+    DiscordWebSocket.DEFAULT_GATEWAY = yarl.URL(f"ws://127.0.0.1:{port}/gateway")
+
+
+class FakeDiscord:
+    """Local stand-in for just enough of Discord's gateway and REST API to run the cogs
+
+    It serves a single bot user, synthetic guilds with voice channels and voice
+    states, member edits (PATCH) with configurable latency, a per-guild rate
+    limit bucket and random 429 injection, and interaction callbacks and
+    followups. Gateway connections get the guilds and events of the shard they
+    identify as, out of shard_count. Every REST call is counted per route, and complete_interaction
+    resolves the futures returned by send_interaction so command latency can be
+    measured.
+    """
+
+    def __init__(self, *, edit_latency=0.0, rate_limit=None, rate_limit_window=1.0, inject_429=0.0, inject_5xx=0.0,
+                 chunk_size=1000, shard_count=1):
+        self.edit_latency = edit_latency
+        # Member edits allowed per guild per window. Rate limit headers are always sent,
+        # since discord.py serializes a bucket's requests until it has seen them.
+        self.rate_limit = rate_limit or UNLIMITED
+        self.rate_limit_window = rate_limit_window
+        self.inject_429 = inject_429
+        # The next this many member edits are answered with 429, whatever the bucket says
+        self.force_429 = 0
+        # Fraction of member edits answered with 503, which discord.py doesn't retry itself
+        self.inject_5xx = inject_5xx
+        self.chunk_size = chunk_size
+        self.shard_count = shard_count
+
+        self._ids = itertools.count(1)
+        self.bot_id = self.snowflake()
+        self.application_id = self.bot_id
+        self.owner_id = self.snowflake()
+        self.guilds = {}
+        self.api_calls = Counter()
+        self.status_counts = Counter()
+        self.rate_limited = 0
+        # Choices of every autocomplete response, in order
+        self.autocomplete_choices = []
+        # key: (guild_id, member_id), value: applied mute edits
+        self.mute_edits = Counter()
+        # key: shard ID, value: IDENTIFYs received for it
+        self.identified = Counter()
+
+        self._buckets = {}
+        # key: gateway connection, value: the shard it identified as
+        self._sockets = {}
+        self._sequence = itertools.count(1)
+        self._pending_interactions = {}
+        self._runner = None
+        self.port = None
+
+    def snowflake(self, shard=None) -> int:
+        """A new ID, optionally one that as a guild ID lands on the given shard"""
+        timestamp = int(time.time() * 1000) - DISCORD_EPOCH
+        if shard is not None:
+            timestamp += (shard - timestamp) % self.shard_count
+        return (timestamp << 22) | (next(self._ids) & 0x3FFFFF)
+
+    def shard_of(self, guild_id) -> int:
+        return (guild_id >> 22) % self.shard_count
+
+    # --- Synthetic data ---
+
+    def add_guild(self, *, members=0, voice_channels=(), muted_fraction=0.0, large=None, shard=None):
+        """Create a guild with members extra members and voice channels of the given sizes
+
+        Returns (guild_id, [channel_id, ...]). Voice participants are drawn from the
+        guild's members, and muted_fraction of them start out server-muted.
+        """
+        guild_id = self.snowflake(shard)
+        total = max(members, sum(voice_channels))
+        member_ids = [self.snowflake() for _ in range(total)]
+        channels = {}
+        voice_states = {}
+        position = iter(member_ids)
+        for size in voice_channels:
+            channel_id = self.snowflake()
+            channels[channel_id] = {"id": str(channel_id), "type": 2, "name": f"voice-{len(channels)}", "position": len(channels),
+                                    "permission_overwrites": [], "bitrate": 64000, "user_limit": 0, "parent_id": None, "nsfw": False}
+            for _ in range(size):
+                member_id = next(position)
+                voice_states[member_id] = {"channel_id": channel_id, "mute": random.random() < muted_fraction}
+
+        self.guilds[guild_id] = {
+            "member_ids": member_ids,
+            "channels": channels,
+            "voice_states": voice_states,
+            "large": total > 250 if large is None else large,
+        }
+        return guild_id, list(channels)
+
+    def _user(self, user_id):
+        return {"id": str(user_id), "username": f"user{user_id % 100000}", "discriminator": "0", "global_name": None,
+                "avatar": None, "bot": user_id == self.bot_id}
+
+    def _member(self, guild_id, user_id, with_user=True):
+        state = self.guilds[guild_id]["voice_states"].get(user_id)
+        member = {"roles": [], "joined_at": "2024-01-01T00:00:00+00:00", "deaf": False,
+                  "mute": bool(state and state["mute"]), "nick": None, "flags": 0, "pending": False}
+        if with_user:
+            member["user"] = self._user(user_id)
+        return member
+
+    def _voice_state(self, guild_id, user_id, include_member=False):
+        state = self.guilds[guild_id]["voice_states"][user_id]
+        payload = {"user_id": str(user_id), "channel_id": str(state["channel_id"]) if state["channel_id"] else None,
+                   "session_id": f"session-{user_id}", "deaf": False, "mute": state["mute"], "self_deaf": False,
+                   "self_mute": False, "self_video": False, "self_stream": False, "suppress": False, "request_to_speak_timestamp": None}
+        if include_member:
+            payload["guild_id"] = str(guild_id)
+            payload["member"] = self._member(guild_id, user_id)
+        return payload
+
+    def _guild_create(self, guild_id):
+        guild = self.guilds[guild_id]
+        # Like Discord, large guilds only ship voice participants and the bot itself
+        if guild["large"]:
+            initial_members = list(guild["voice_states"]) + [self.bot_id]
+        else:
+            initial_members = guild["member_ids"] + [self.bot_id]
+        return {
+            "id": str(guild_id), "name": f"guild-{guild_id}", "icon": None, "owner_id": str(self.owner_id),
+            "afk_timeout": 300, "verification_level": 0, "default_message_notifications": 0, "explicit_content_filter": 0,
+            "roles": [{"id": str(guild_id), "name": "@everyone", "permissions": str(ADMINISTRATOR), "position": 0,
+                       "color": 0, "hoist": False, "managed": False, "mentionable": False, "flags": 0}],
+            "emojis": [], "stickers": [], "features": [], "mfa_level": 0, "system_channel_flags": 0, "premium_tier": 0,
+            "preferred_locale": "en-US", "nsfw_level": 0, "premium_progress_bar_enabled": False, "unavailable": False,
+            "member_count": len(guild["member_ids"]) + 1, "large": guild["large"],
+            "channels": list(guild["channels"].values()), "threads": [], "presences": [], "stage_instances": [],
+            "guild_scheduled_events": [], "soundboard_sounds": [],
+            "members": [self._member(guild_id, member_id) for member_id in initial_members],
+            "voice_states": [self._voice_state(guild_id, member_id) for member_id in guild["voice_states"]],
+        }
+
+    # --- Lifecycle ---
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    async def start(self):
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_get("/gateway", self._gateway)
+        app.router.add_route("*", API_PREFIX + "/{path:.*}", self._rest)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    def install(self):
+        """Point discord.py's REST and gateway clients at this server"""
+        install(self.port)
+
+    async def stop(self):
+        for ws in list(self._sockets):
+            await ws.close()
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    def reset_counters(self):
+        self.api_calls.clear()
+        self.status_counts.clear()
+        self.rate_limited = 0
+        self.mute_edits.clear()
+        self.autocomplete_choices.clear()
+
+    # --- Gateway ---
+
+    async def _send(self, ws, event, data):
+        await ws.send_str(json.dumps({"op": 0, "t": event, "s": next(self._sequence), "d": data}))
+
+    async def dispatch(self, event, data):
+        """Send an event to every connection, or only the guild's shard for guild events"""
+        shard = self.shard_of(int(data["guild_id"])) if "guild_id" in data else None
+        for ws, ws_shard in list(self._sockets.items()):
+            if not ws.closed and shard in (None, ws_shard):
+                await self._send(ws, event, data)
+
+    async def _gateway(self, request):
+        ws = web.WebSocketResponse(max_msg_size=0)
+        await ws.prepare(request)
+        await ws.send_str(json.dumps({"op": 10, "d": {"heartbeat_interval": 41250}}))
+        self._sockets[ws] = None
+        try:
+            async for msg in ws:
+                if msg.type != aiohttp.WSMsgType.TEXT:
+                    continue
+                payload = json.loads(msg.data)
+                op = payload["op"]
+                if op == 1:
+                    await ws.send_str(json.dumps({"op": 11}))
+                elif op == 2:
+                    await self._identify(ws, payload["d"].get("shard") or [0, 1])
+                elif op == 8:
+                    await self._request_members(ws, payload["d"])
+        finally:
+            self._sockets.pop(ws, None)
+        return ws
+
+    async def _identify(self, ws, shard):
+        shard_id = shard[0]
+        self._sockets[ws] = shard_id
+        self.identified[shard_id] += 1
+        guild_ids = [guild_id for guild_id in self.guilds if self.shard_of(guild_id) == shard_id]
+        await self._send(ws, "READY", {
+            "v": 10, "user": self._user(self.bot_id), "session_id": f"fake-session-{shard_id}",
+            "resume_gateway_url": f"ws://127.0.0.1:{self.port}/gateway",
+            "guilds": [{"id": str(guild_id), "unavailable": True} for guild_id in guild_ids],
+            "application": {"id": str(self.application_id), "flags": 0}, "shard": shard,
+        })
+        for guild_id in guild_ids:
+            await self._send(ws, "GUILD_CREATE", self._guild_create(guild_id))
+
+    async def _request_members(self, ws, data):
+        guild_id = int(data["guild_id"])
+        guild = self.guilds[guild_id]
+        if data.get("user_ids"):
+            known = set(guild["member_ids"])
+            member_ids = [int(user_id) for user_id in data["user_ids"] if int(user_id) in known]
+            # Like Discord, return no more members than the request's limit
+            member_ids = member_ids[:data.get("limit") or len(member_ids)]
+        else:
+            member_ids = guild["member_ids"] + [self.bot_id]
+        chunks = [member_ids[i:i + self.chunk_size] for i in range(0, len(member_ids), self.chunk_size)] or [[]]
+        for index, chunk in enumerate(chunks):
+            await self._send(ws, "GUILD_MEMBERS_CHUNK", {
+                "guild_id": str(guild_id), "members": [self._member(guild_id, member_id) for member_id in chunk],
+                "chunk_index": index, "chunk_count": len(chunks), "nonce": data.get("nonce"), "not_found": [],
+            })
+
+    # --- Interactions ---
+
+    def _option(self, name, value):
+        if isinstance(value, tuple) and value[0] == "member":
+            return {"name": name, "type": 6, "value": str(value[1])}
+        if isinstance(value, tuple) and value[0] == "channel":
+            return {"name": name, "type": 7, "value": str(value[1])}
+        return {"name": name, "type": 3, "value": str(value)}
+
+    def send_interaction(self, guild_id, name, focused=None, **options):
+        """Dispatch a slash command, returns a future resolved by complete_interaction
+
+        Member options are given as ("member", id) and channel options as ("channel", id).
+        With focused set to an option name it is an autocomplete request instead,
+        completed by the bot's suggestions. The future's result is the latency in seconds.
+        """
+        interaction_id = self.snowflake()
+        token = f"token-{interaction_id}"
+        guild = self.guilds[guild_id]
+        resolved = {"users": {}, "members": {}, "channels": {}}
+        for value in options.values():
+            if isinstance(value, tuple) and value[0] == "member":
+                resolved["users"][str(value[1])] = self._user(value[1])
+                member = self._member(guild_id, value[1], with_user=False)
+                member["permissions"] = str(ADMINISTRATOR)
+                resolved["members"][str(value[1])] = member
+            elif isinstance(value, tuple) and value[0] == "channel":
+                channel = dict(guild["channels"][value[1]])
+                channel["permissions"] = str(ADMINISTRATOR)
+                resolved["channels"][str(value[1])] = channel
+
+        moderator = self._member(guild_id, self.owner_id)
+        moderator["permissions"] = str(ADMINISTRATOR | MUTE_MEMBERS)
+        first_channel = next(iter(guild["channels"]))
+        command_options = [self._option(key, value) for key, value in options.items()]
+        for option in command_options:
+            if option["name"] == focused:
+                option["focused"] = True
+        payload = {
+            "id": str(interaction_id), "application_id": str(self.application_id), "type": 4 if focused else 2, "token": token, "version": 1,
+            "guild_id": str(guild_id), "channel_id": str(first_channel), "channel": guild["channels"][first_channel],
+            "member": moderator, "app_permissions": str(ADMINISTRATOR), "locale": "en-US", "guild_locale": "en-US",
+            "entitlements": [], "attachment_size_limit": 10485760, "authorizing_integration_owners": {"0": str(guild_id)}, "context": 0,
+            "data": {"id": str(self.snowflake()), "name": name, "type": 1,
+                     "options": command_options, "resolved": resolved},
+        }
+        future = asyncio.get_running_loop().create_future()
+        self._pending_interactions[token] = (time.perf_counter(), future)
+        asyncio.ensure_future(self.dispatch("INTERACTION_CREATE", payload))
+        return future
+
+    def complete_interaction(self, token):
+        """Mark a command as finished, e.g. from the bot's on_app_command_completion"""
+        pending = self._pending_interactions.pop(token, None)
+        if pending is not None and not pending[1].done():
+            pending[1].set_result(time.perf_counter() - pending[0])
+
+    # --- REST ---
+
+    async def _rest(self, request):
+        path = request.match_info["path"]
+        parts = path.split("/")
+        method = request.method
+        route = "/".join(part if not part.isdigit() and not part.startswith("token-") else "{id}" for part in parts)
+        self.api_calls[f"{method} /{route}"] += 1
+
+        body = None
+        if request.can_read_body:
+            try:
+                body = await request.json()
+            except (ValueError, UnicodeDecodeError):
+                body = None
+
+        if path == "users/@me":
+            return json_response(self._user(self.bot_id))
+        if path == "oauth2/applications/@me":
+            return json_response({
+                "id": str(self.application_id), "name": "fake", "icon": None, "description": "", "bot_public": True,
+                "bot_require_code_grant": False, "verify_key": "0" * 64, "flags": 0, "summary": "",
+                "owner": self._user(self.owner_id), "team": None, "interactions_endpoint_url": None,
+            })
+        if path == "gateway/bot":
+            return json_response({"url": f"ws://127.0.0.1:{self.port}/gateway", "shards": self.shard_count,
+                                      "session_start_limit": {"total": 1000, "remaining": 1000, "reset_after": 0, "max_concurrency": 1}})
+        if parts[0] == "applications" and parts[-1] == "commands" and method == "PUT":
+            return json_response([dict(command, id=str(self.snowflake()), application_id=str(self.application_id), version="1")
+                                      for command in body or []])
+        if parts[0] == "guilds" and len(parts) == 4 and parts[2] == "members" and method == "PATCH":
+            return await self._edit_member(int(parts[1]), int(parts[3]), body or {})
+        if parts[0] == "guilds" and len(parts) == 4 and parts[2] == "members" and method == "GET":
+            guild_id, member_id = int(parts[1]), int(parts[3])
+            if guild_id in self.guilds and member_id in self.guilds[guild_id]["member_ids"]:
+                return json_response(self._member(guild_id, member_id))
+            return json_response({"message": "Unknown Member", "code": 10007}, status=404)
+        if parts[0] == "interactions" and parts[-1] == "callback":
+            if (body or {}).get("type") == 8:
+                # Autocomplete suggestions are the whole response
+                self.complete_interaction(parts[2])
+                self.autocomplete_choices.append(body["data"]["choices"])
+            return json_response({"interaction": {"id": parts[1], "type": 2, "response_message_loading": True},
+                                      "resource": {"type": (body or {}).get("type", 5)}})
+        if parts[0] == "webhooks":
+            # Commands may edit their original response (progress) before the final
+            # report, so completion comes from the bot rather than from a route here
+            return json_response(self._message(body or {}))
+        return json_response({"message": "404: Not Found", "code": 0}, status=404)
+
+    def _message(self, body):
+        return {"id": str(self.snowflake()), "channel_id": "0", "type": 0, "content": body.get("content", ""),
+                "author": self._user(self.bot_id), "attachments": [], "embeds": [], "mentions": [], "mention_roles": [],
+                "pinned": False, "mention_everyone": False, "tts": False, "timestamp": "2024-01-01T00:00:00+00:00",
+                "edited_timestamp": None, "flags": body.get("flags", 0), "components": []}
+
+    def _rate_limit_headers(self, guild_id):
+        now = time.monotonic()
+        remaining, reset_at = self._buckets.get(guild_id, (self.rate_limit, now + self.rate_limit_window))
+        if now >= reset_at:
+            remaining, reset_at = self.rate_limit, now + self.rate_limit_window
+        limited = remaining <= 0
+        if not limited:
+            remaining -= 1
+        self._buckets[guild_id] = (remaining, reset_at)
+        headers = {"X-RateLimit-Limit": str(self.rate_limit), "X-RateLimit-Remaining": str(remaining),
+                   "X-RateLimit-Reset-After": f"{reset_at - now:.3f}", "X-RateLimit-Bucket": f"member-{guild_id}"}
+        return limited, reset_at - now, headers
+
+    async def _edit_member(self, guild_id, member_id, body):
+        limited, retry_after, headers = self._rate_limit_headers(guild_id)
+        if not limited and (self.force_429 or (self.inject_429 and random.random() < self.inject_429)):
+            self.force_429 = max(0, self.force_429 - 1)
+            limited, retry_after = True, 0.05
+        if limited:
+            self.rate_limited += 1
+            self.status_counts[429] += 1
+            # discord.py treats a 429 without a Via header as a Cloudflare ban and gives up
+            headers = dict(headers, **{"Retry-After": f"{retry_after:.3f}", "X-RateLimit-Scope": "user", "Via": "1.1 google"})
+            return json_response({"message": "You are being rate limited.", "retry_after": retry_after, "global": False},
+                                 status=429, headers=headers)
+
+        if self.edit_latency:
+            await asyncio.sleep(self.edit_latency)
+        if self.inject_5xx and random.random() < self.inject_5xx:
+            self.status_counts[503] += 1
+            return json_response({"message": "Service Unavailable", "code": 0}, status=503, headers=headers)
+        guild = self.guilds[guild_id]
+        state = guild["voice_states"].get(member_id)
+        if "mute" in body:
+            if state is None or state["channel_id"] is None:
+                self.status_counts[400] += 1
+                return json_response({"message": "Target user is not connected to voice.", "code": 40032}, status=400)
+            state["mute"] = bool(body["mute"])
+            self.mute_edits[guild_id, member_id] += 1
+            await self.dispatch("VOICE_STATE_UPDATE", self._voice_state(guild_id, member_id, include_member=True))
+        self.status_counts[200] += 1
+        return json_response(self._member(guild_id, member_id), headers=headers)
+
+    def mute_counts(self, guild_id):
+        """Return (muted, unmuted) voice participant counts as the server sees them"""
+        states = self.guilds[guild_id]["voice_states"].values()
+        muted = sum(1 for state in states if state["channel_id"] and state["mute"])
+        return muted, sum(1 for state in states if state["channel_id"]) - muted
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
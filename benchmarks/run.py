@@ -0,0 +1,918 @@
+"""Offline benchmarks for the bot's hot paths, run against FakeDiscord
+
+Run from the repository root:
+
+    python -m benchmarks.run                  # every suite
+    python -m benchmarks.run commands bulk    # selected suites
+    python -m benchmarks.run --json results.json
+
+Each suite prints a small table and adds its numbers to the JSON report, so a
+CI job can compare them with a previous run.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import os
+import random
+import resource
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.fake_discord import FakeDiscord, percentile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Put on PYTHONPATH for bot.py processes, which can't be pointed at FakeDiscord from the inside
+SITECUSTOMIZE = """import os
+
+if os.environ.get("FAKE_DISCORD_PORT"):
+    from benchmarks.fake_discord import install
+    install(int(os.environ["FAKE_DISCORD_PORT"]))
+"""
+
+
+@contextlib.contextmanager
+def quiet():
+    """Silence the bot's console output and logging while a benchmark runs"""
+    if os.getenv("BENCH_VERBOSE"):
+        yield
+        return
+    # A root handler keeps logging's last-resort handler from writing to stderr
+    root = logging.getLogger()
+    handler = logging.NullHandler()
+    root.addHandler(handler)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            yield
+    finally:
+        root.removeHandler(handler)
+
+
+def configure_env(data_dir, **overrides):
+    """Point every on-disk store at a scratch directory"""
+    os.environ["MUTE_STORE_PATH"] = os.path.join(data_dir, "timed_mutes.db")
+    os.environ["COMMAND_SYNC_CACHE_PATH"] = os.path.join(data_dir, "command_sync.json")
+    os.environ["JOB_STORE_PATH"] = os.path.join(data_dir, "mute_jobs.db")
+    os.environ["MOD_LOG_DIR"] = os.path.join(data_dir, "mod_log")
+    os.environ.pop("TEST_GUILD_ID", None)
+    for key, value in overrides.items():
+        os.environ[key] = str(value)
+
+
+async def start_bot(fake, timeout=120.0):
+    """Start BlackWolfManager against the fake server and wait until it is ready"""
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+    os.chdir(REPO_ROOT)
+    import bot as bot_module
+
+    fake.install()
+    instance = bot_module.BlackWolfManager()
+    if hasattr(fake, "complete_interaction"):
+        async def on_app_command_completion(interaction, command):
+            fake.complete_interaction(interaction.token)
+        instance.add_listener(on_app_command_completion)
+    task = asyncio.create_task(instance.start("fake-token"))
+    deadline = time.perf_counter() + timeout
+    while not instance.is_ready():
+        if task.done():
+            task.result()
+        if time.perf_counter() > deadline:
+            raise TimeoutError("Bot did not become ready in time")
+        await asyncio.sleep(0.01)
+    return instance, task
+
+
+async def stop_bot(instance, task):
+    await instance.close()
+    with contextlib.suppress(Exception):
+        await task
+
+
+async def run_commands(fake, guild_id, invocations, concurrency):
+    """Send (name, options) invocations with bounded concurrency, returns latencies in seconds"""
+    limit = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def invoke(name, options):
+        async with limit:
+            latencies.append(await asyncio.wait_for(fake.send_interaction(guild_id, name, **options), 120))
+
+    await asyncio.gather(*(invoke(name, options) for name, options in invocations))
+    return latencies
+
+
+def report(title, rows, columns):
+    print(f"\n== {title} ==")
+    widths = [max(len(column), *(len(f"{row[column]}") for row in rows)) for column in columns]
+    print("  ".join(column.ljust(width) for column, width in zip(columns, widths)))
+    for row in rows:
+        print("  ".join(f"{row[column]}".ljust(width) for column, width in zip(columns, widths)))
+
+
+async def check_voice_index(instance):
+    """Fail the run if the bot's voice state index disagrees with discord.py's guild cache"""
+    # Voice state updates for the last edits may still be on their way
+    await asyncio.sleep(0.2)
+    mismatches = [mismatch for guild in instance.guilds for mismatch in instance.voice_index.check_consistency(guild)]
+    if mismatches:
+        raise RuntimeError(f"Voice state index out of sync with the guild cache ({len(mismatches)} mismatches): {mismatches[:5]}")
+
+
+def require_zero(title, row, fields):
+    """Fail the run if any of a suite's correctness counters is nonzero"""
+    failed = {field: row[field] for field in fields if row[field]}
+    if failed:
+        raise RuntimeError(f"{title} checks failed: {failed}")
+
+
+def command_row(name, latencies, fake, count):
+    return {
+        "command": name,
+        "count": count,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "api_calls_per_command": round(sum(fake.api_calls.values()) / count, 2),
+        "member_edits_per_command": round(sum(n for route, n in fake.api_calls.items() if route.startswith("PATCH /guilds")) / count, 2),
+    }
+
+
+async def bench_commands(args):
+    """p50/p99 latency, API calls per command and memory per active timed mute"""
+    fake = FakeDiscord(edit_latency=args.edit_latency, inject_429=args.inject_429, inject_5xx=args.inject_5xx)
+    await fake.start()
+    guild_id, (target_channel, bulk_channel) = fake.add_guild(voice_channels=(args.mutes, args.channel_size))
+    target_ids = [member_id for member_id, state in fake.guilds[guild_id]["voice_states"].items() if state["channel_id"] == target_channel]
+    rows = []
+    memory_per_mute = 0.0
+    with tempfile.TemporaryDirectory() as data_dir, quiet():
+        configure_env(data_dir)
+        instance, task = await start_bot(fake)
+        try:
+            tracemalloc.start()
+            before = tracemalloc.take_snapshot()
+            fake.reset_counters()
+            latencies = await run_commands(fake, guild_id, [("mute", {"member": ("member", member_id), "duration": "1h"}) for member_id in target_ids], args.concurrency)
+            after = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            rows.append(command_row("/mute", latencies, fake, len(target_ids)))
+            repo_filter = [tracemalloc.Filter(True, os.path.join(REPO_ROOT, "utils", "*"))]
+            growth = sum(stat.size_diff for stat in after.filter_traces(repo_filter).compare_to(before.filter_traces(repo_filter), "filename"))
+            memory_per_mute = growth / max(1, len(instance.unmute_scheduler))
+
+            fake.reset_counters()
+            latencies = await run_commands(fake, guild_id, [("unmute", {"member": ("member", member_id)}) for member_id in target_ids], args.concurrency)
+            rows.append(command_row("/unmute", latencies, fake, len(target_ids)))
+
+            for name in ("mutechannel", "unmutechannel"):
+                fake.reset_counters()
+                latencies = await run_commands(fake, guild_id, [(name, {"channel": ("channel", bulk_channel)})], 1)
+                rows.append(command_row(f"/{name} ({args.channel_size} members)", latencies, fake, 1))
+            await check_voice_index(instance)
+        finally:
+            await stop_bot(instance, task)
+            await fake.stop()
+
+    report("Command latency", rows, ["command", "count", "p50_ms", "p99_ms", "api_calls_per_command", "member_edits_per_command"])
+    print(f"Memory per active timed mute: {memory_per_mute:.0f} bytes")
+    return {"commands": rows, "memory_per_timed_mute_bytes": round(memory_per_mute)}
+
+
+async def bench_bulk(args):
+    """Wall time of /mutechannel for growing channels, serial vs concurrent member edits"""
+    rows = []
+    for concurrency in (1, args.bulk_concurrency):
+        for size in args.bulk_sizes:
+            fake = FakeDiscord(edit_latency=args.edit_latency, rate_limit=args.rate_limit, inject_429=args.inject_429,
+                               inject_5xx=args.inject_5xx)
+            await fake.start()
+            guild_id, (channel_id,) = fake.add_guild(voice_channels=(size,))
+            with tempfile.TemporaryDirectory() as data_dir, quiet():
+                configure_env(data_dir, BULK_EDIT_CONCURRENCY=concurrency)
+                instance, task = await start_bot(fake)
+                try:
+                    fake.reset_counters()
+                    (latency,) = await run_commands(fake, guild_id, [("mutechannel", {"channel": ("channel", channel_id)})], 1)
+                    muted, _ = fake.mute_counts(guild_id)
+                    await check_voice_index(instance)
+                finally:
+                    await stop_bot(instance, task)
+                    await fake.stop()
+            rows.append({"members": size, "concurrency": concurrency, "wall_s": round(latency, 3),
+                         "muted": muted, "rate_limited": fake.rate_limited, "server_errors": fake.status_counts[503]})
+
+    report("Bulk /mutechannel", rows, ["members", "concurrency", "wall_s", "muted", "rate_limited", "server_errors"])
+    return {"bulk": rows}
+
+
+async def bench_conflicts(args):
+    """Concurrent conflicting mute/unmute requests: API calls saved and final-state correctness
+
+    Requests go straight to the bot's member editor, as commands' own checks
+    would reject most of them before they conflict. Expected state follows the
+    last request per member; a mute's duration survives later mutes without one
+    and is cleared by an unmute. The suite fails if any member ends in the
+    wrong state or with the wrong timer.
+    """
+    fake = FakeDiscord(edit_latency=args.edit_latency)
+    await fake.start()
+    guild_id, (channel_id,) = fake.add_guild(voice_channels=(args.conflict_members,), muted_fraction=0.0)
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as data_dir, quiet():
+        configure_env(data_dir)
+        instance, task = await start_bot(fake)
+        try:
+            guild = instance.get_guild(guild_id)
+            members = [member for member in guild.get_channel(channel_id).members if member.id != guild.me.id]
+            editor = instance.member_editor
+            fake.reset_counters()
+            expected = {}
+            requests = []
+            started = time.perf_counter()
+            for i in range(args.conflicts):
+                member = rng.choice(members)
+                mute = rng.random() < 0.5
+                deadline = time.time() + 3600 + i if mute and rng.random() < 0.5 else None
+                _, expected_deadline = expected.get(member.id, (False, None))
+                expected[member.id] = (mute, (deadline or expected_deadline) if mute else None)
+                requests.append(asyncio.create_task(editor.edit_mute(member, mute, "Benchmark", deadline=deadline)))
+                # Arrive in bursts, some while earlier edits for the same member are in flight
+                if i % 100 == 99:
+                    await asyncio.sleep(rng.random() * args.edit_latency)
+            statuses = await asyncio.gather(*requests)
+            wall = time.perf_counter() - started
+
+            state = fake.guilds[guild_id]["voice_states"]
+            wrong_state = sum(state[member_id]["mute"] != mute for member_id, (mute, _) in expected.items())
+            wrong_timer = sum(instance.unmute_scheduler.deadline(guild_id, member_id) != deadline
+                              for member_id, (mute, deadline) in expected.items())
+            api_calls = sum(n for route, n in fake.api_calls.items() if route.startswith("PATCH /guilds"))
+            await check_voice_index(instance)
+        finally:
+            await stop_bot(instance, task)
+            await fake.stop()
+
+    row = {"requests": args.conflicts, "members": len(expected), "api_calls": api_calls,
+           "saved_pct": round(100 * (1 - api_calls / args.conflicts), 1),
+           "superseded": statuses.count("superseded"), "wall_s": round(wall, 3),
+           "wrong_state": wrong_state, "wrong_timer": wrong_timer}
+    report("Conflicting edits", [row], list(row))
+    require_zero("Conflicting edits", row, ("wrong_state", "wrong_timer"))
+    return {"conflicts": row}
+
+
+async def bench_scheduler(args):
+    """Memory and firing jitter of the unmute scheduler with many pending mutes"""
+    from utils.unmute_scheduler import UnmuteScheduler
+
+    lags = []
+    deadlines = {}
+
+    async def handler(keys):
+        now = time.time()
+        lags.extend(now - deadlines[key] for key in keys)
+
+    scheduler = UnmuteScheduler(handler=handler)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    start = time.time() + args.scheduler_spread
+    for member_id in range(args.scheduled):
+        deadline = start + random.random() * args.scheduler_spread
+        scheduler.schedule(1, member_id, deadline)
+    memory = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    for member_id in range(args.scheduled):
+        deadlines[(1, member_id)] = scheduler.deadline(1, member_id)
+
+    scheduler.start()
+    while len(lags) < args.scheduled:
+        await asyncio.sleep(0.1)
+    scheduler.stop()
+
+    row = {"scheduled": args.scheduled, "bytes_per_entry": round(memory / args.scheduled),
+           "lag_p50_ms": round(percentile(lags, 0.50) * 1000, 2), "lag_p99_ms": round(percentile(lags, 0.99) * 1000, 2),
+           "lag_max_ms": round(max(lags) * 1000, 2)}
+    report("Unmute scheduler", [row], list(row))
+    return {"scheduler": row}
+
+
+async def bench_reconcile(args):
+    """Time to restore persisted timed mutes at startup and unmute the overdue ones
+
+    Half the records are already overdue, as after a long outage. The bot is
+    started on the store, so the overdue ones go through the real unmute path
+    (the user_mute cog and MemberEditor) against FakeDiscord. Every overdue
+    member must be unmuted and every other record left pending; the suite fails
+    otherwise.
+    """
+    from utils.mute_store import MuteStore
+    from utils.unmute_scheduler import UnmuteScheduler
+
+    guilds = 50
+    fake = FakeDiscord(edit_latency=args.edit_latency, rate_limit=args.rate_limit)
+    await fake.start()
+    now = time.time()
+    overdue, future = [], []
+    for _ in range(guilds):
+        guild_id, _ = fake.add_guild(voice_channels=(args.records // guilds,), muted_fraction=1.0)
+        for member_id in fake.guilds[guild_id]["voice_states"]:
+            (overdue if member_id % 2 else future).append((guild_id, member_id))
+    try:
+        with tempfile.TemporaryDirectory() as data_dir, quiet():
+            configure_env(data_dir)
+            store = MuteStore(os.environ["MUTE_STORE_PATH"])
+            store.add_many([key + (now - 60,) for key in overdue] + [key + (now + 3600,) for key in future])
+            store.close()
+
+            # Restoring alone, as the bot does in setup_hook
+            started = time.perf_counter()
+            store = MuteStore(os.environ["MUTE_STORE_PATH"])
+            loaded = UnmuteScheduler(store=store).load()
+            load_s = time.perf_counter() - started
+            store.close()
+
+            started = time.perf_counter()
+            instance, task = await start_bot(fake)
+            try:
+                ready_s = time.perf_counter() - started
+                deadline = time.perf_counter() + 300
+                while sum(fake.mute_edits[key] > 0 for key in overdue) < len(overdue) and time.perf_counter() < deadline:
+                    await asyncio.sleep(0.05)
+                reconciled_s = time.perf_counter() - started
+                # Let the last batch's store cleanup finish
+                await asyncio.sleep(0.5)
+            finally:
+                await stop_bot(instance, task)
+            store = MuteStore(os.environ["MUTE_STORE_PATH"])
+            remaining = len(store.load_all())
+            store.close()
+    finally:
+        await fake.stop()
+
+    row = {"records": loaded, "overdue": len(overdue), "load_s": round(load_s, 3), "ready_s": round(ready_s, 3),
+           "reconciled_s": round(reconciled_s, 3), "overdue_fired": sum(fake.mute_edits[key] > 0 for key in overdue),
+           "left_in_store": remaining}
+    report("Startup reconciliation", [row], list(row))
+    row["not_fired"] = len(overdue) - row["overdue_fired"]
+    row["fired_early"] = sum(fake.mute_edits[key] > 0 for key in future)
+    row["store_mismatch"] = abs(remaining - len(future))
+    require_zero("Startup reconciliation", row, ("not_fired", "fired_early", "store_mismatch"))
+    return {"reconcile": row}
+
+
+def peak_rss_kb():
+    """This process's peak resident set size in KiB
+
+    Read from VmHWM, which starts over on exec. On Linux ru_maxrss carries the
+    parent's peak over fork and exec, so it is only a fallback without /proc.
+    """
+    with contextlib.suppress(OSError):
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+async def startup_worker(args):
+    """Measure one bot startup against the FakeDiscord on --port, prints a JSON line"""
+    from benchmarks.fake_discord import install
+
+    class Remote:
+        # start_bot only needs to point discord.py at the server
+        def install(self):
+            install(args.port)
+
+    with tempfile.TemporaryDirectory() as data_dir, quiet():
+        configure_env(data_dir, MEMBER_CACHE_MODE=args.mode)
+        started = time.perf_counter()
+        instance, task = await start_bot(Remote(), timeout=600)
+        ready = time.perf_counter() - started
+        cached = sum(len(guild.members) for guild in instance.guilds)
+        cogs_ms = instance.cog_loader.load_ms
+        await stop_bot(instance, task)
+    maxrss_kb = peak_rss_kb()
+    print(json.dumps({"mode": args.mode, "guild_members": args.guild_members, "ready_s": round(ready, 3),
+                      "cogs_ms": cogs_ms, "cached_members": cached, "maxrss_mb": round(maxrss_kb / 1024, 1)}))
+
+
+async def bench_startup(args):
+    """Time to ready and peak RSS for full vs lean member cache
+
+    The fake server stays in this process and each bot starts in a fresh one
+    that reports its own peak RSS.
+    """
+    fake = FakeDiscord(chunk_size=1000)
+    await fake.start()
+    # One big guild with a busy stage-sized voice channel
+    fake.add_guild(members=args.guild_members, voice_channels=(150, 50))
+    rows = []
+    try:
+        for mode in ("full", "lean"):
+            process = await asyncio.create_subprocess_exec(
+                sys.executable, "-m", "benchmarks.run", "startup-worker", "--mode", mode,
+                "--port", str(fake.port), "--guild-members", str(args.guild_members),
+                cwd=REPO_ROOT, stdout=subprocess.PIPE,
+            )
+            output, _ = await process.communicate()
+            if process.returncode != 0:
+                raise RuntimeError(f"Startup worker for {mode} mode failed")
+            rows.append(json.loads(output.decode().strip().splitlines()[-1]))
+    finally:
+        await fake.stop()
+    report("Startup", rows, ["mode", "guild_members", "ready_s", "cogs_ms", "cached_members", "maxrss_mb"])
+    return {"startup": rows}
+
+
+async def cluster_worker(args):
+    """One cluster worker against the FakeDiscord on --port, writes its report to --report-dir"""
+    from benchmarks.fake_discord import install
+    from utils.coordination import ShardView
+    from utils.mute_store import MuteStore
+
+    class Remote:
+        def install(self):
+            install(args.port)
+
+    shard_ids = [int(shard_id) for shard_id in os.environ["SHARD_IDS"].split(",")]
+    shard_count = int(os.environ["SHARD_COUNT"])
+    # The same query the bot's ShardView runs at startup
+    store = MuteStore(os.environ["MUTE_STORE_PATH"])
+    loaded = ShardView(store, shard_ids, shard_count).load_all()
+    store.close()
+    with quiet():
+        instance, task = await start_bot(Remote())
+        guild_ids = {guild.id for guild in instance.guilds}
+        deadline = time.perf_counter() + 60
+        while len(instance.unmute_scheduler) and time.perf_counter() < deadline:
+            await asyncio.sleep(0.1)
+        pending = len(instance.unmute_scheduler)
+        # Let the last batch's store cleanup finish
+        await asyncio.sleep(0.5)
+        await stop_bot(instance, task)
+    report_path = os.path.join(args.report_dir, f"worker-{os.environ['WORKER_ID']}.json")
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump({"worker": int(os.environ["WORKER_ID"]), "shards": shard_ids, "guilds": len(guild_ids),
+                   "loaded": len(loaded), "foreign": sum(1 for row in loaded if row[0] not in guild_ids),
+                   "pending": pending}, f)
+
+
+async def bench_cluster(args):
+    """A multi-process cluster sharing one SQLite mute store
+
+    Timed mutes for guilds on every shard are seeded into the store, half of
+    them already overdue. Each worker must restore only its own shards' rows,
+    every member must be unmuted exactly once, and the store must end empty;
+    the suite fails otherwise.
+    """
+    from utils.cluster import run_cluster
+    from utils.mute_store import MuteStore
+
+    fake = FakeDiscord(shard_count=args.cluster_shards)
+    await fake.start()
+    now = time.time()
+    records = []
+    for index in range(args.cluster_guilds):
+        guild_id, _ = fake.add_guild(voice_channels=(args.cluster_members,), muted_fraction=1.0, shard=index % args.cluster_shards)
+        records.extend((guild_id, member_id, now + (-60 if member_id % 2 else 3))
+                       for member_id in fake.guilds[guild_id]["voice_states"])
+    try:
+        with tempfile.TemporaryDirectory() as data_dir:
+            configure_env(data_dir)
+            store = MuteStore(os.environ["MUTE_STORE_PATH"])
+            store.add_many(records)
+            store.close()
+            os.chdir(REPO_ROOT)
+            started = time.perf_counter()
+            codes = await run_cluster([sys.executable, "-m", "benchmarks.run", "cluster-worker", "--port", str(fake.port),
+                                       "--report-dir", data_dir], args.cluster_workers, args.cluster_shards, restart=False)
+            wall = time.perf_counter() - started
+            if any(codes):
+                raise RuntimeError(f"Cluster workers failed with exit codes {codes}")
+            workers = []
+            for worker_id in range(len(codes)):
+                with open(os.path.join(data_dir, f"worker-{worker_id}.json"), encoding="utf-8") as f:
+                    workers.append(json.load(f))
+            store = MuteStore(os.environ["MUTE_STORE_PATH"])
+            left_in_store = len(store.load_all())
+            store.close()
+    finally:
+        await fake.stop()
+
+    for worker in workers:
+        worker["shards"] = ",".join(map(str, worker["shards"]))
+    report("Cluster workers", workers, ["worker", "shards", "guilds", "loaded", "foreign", "pending"])
+    keys = [(guild_id, member_id) for guild_id, member_id, _ in records]
+    loaded = sum(worker["loaded"] for worker in workers)
+    row = {"workers": len(workers), "shards": args.cluster_shards, "timed_mutes": len(records), "loaded": loaded,
+           "unmuted_once": sum(fake.mute_edits[key] == 1 for key in keys),
+           "not_unmuted": sum(fake.mute_edits[key] == 0 for key in keys),
+           "unmuted_twice": sum(fake.mute_edits[key] > 1 for key in keys),
+           "still_muted": sum(fake.guilds[guild_id]["voice_states"][member_id]["mute"] for guild_id, member_id in keys),
+           "foreign": sum(worker["foreign"] for worker in workers), "pending": sum(worker["pending"] for worker in workers),
+           "left_in_store": left_in_store, "wall_s": round(wall, 3)}
+    report("Cluster", [row], list(row))
+    # Shards don't overlap, so every row is loaded exactly once across the workers
+    row["loaded_mismatch"] = abs(loaded - len(records))
+    require_zero("Cluster", row, ("not_unmuted", "unmuted_twice", "still_muted", "foreign", "pending", "left_in_store",
+                                  "loaded_mismatch"))
+    supervised = await run_supervised_cluster(args)
+    return {"cluster": {"summary": row, "workers": workers, "bot_py": supervised}}
+
+
+async def run_supervised_cluster(args):
+    """Start a cluster the way operators do, through bot.py with CLUSTER_WORKERS set in .env
+
+    A copy of bot.py is run so the .env it loads is this suite's own. Every
+    shard's guild has overdue timed mutes, and the cluster is stopped once they
+    are all unmuted. Each shard must be connected exactly once, i.e. workers
+    don't start clusters of their own. The cluster is stopped with SIGTERM
+    right after the unmutes, so their history events are still buffered; the
+    workers must close cleanly and write them.
+    """
+    from utils.mod_log import RECORD
+    from utils.mute_store import MuteStore
+
+    fake = FakeDiscord(shard_count=args.cluster_shards)
+    await fake.start()
+    records = []
+    for shard in range(args.cluster_shards):
+        guild_id, _ = fake.add_guild(voice_channels=(args.cluster_members,), muted_fraction=1.0, shard=shard)
+        records.extend((guild_id, member_id, time.time() - 60) for member_id in fake.guilds[guild_id]["voice_states"])
+    keys = [(guild_id, member_id) for guild_id, member_id, _ in records]
+    process = None
+    try:
+        with tempfile.TemporaryDirectory() as app_dir:
+            for name in ("bot.py", "utils", "cogs"):
+                source = os.path.join(REPO_ROOT, name)
+                if os.path.isdir(source):
+                    shutil.copytree(source, os.path.join(app_dir, name), ignore=shutil.ignore_patterns("__pycache__"))
+                else:
+                    shutil.copy(source, app_dir)
+            with open(os.path.join(app_dir, ".env"), "w", encoding="utf-8") as f:
+                f.write(f"DISCORD_TOKEN=fake-token\nCLUSTER_WORKERS={args.cluster_workers}\n"
+                        f"SHARD_COUNT={args.cluster_shards}\nLOG_LEVEL=ERROR\n")
+            hooks_dir = os.path.join(app_dir, "hooks")
+            os.makedirs(hooks_dir)
+            with open(os.path.join(hooks_dir, "sitecustomize.py"), "w", encoding="utf-8") as f:
+                f.write(SITECUSTOMIZE)
+            data_dir = os.path.join(app_dir, "data")
+            configure_env(data_dir)
+            store = MuteStore(os.environ["MUTE_STORE_PATH"])
+            store.add_many(records)
+            store.close()
+
+            env = dict(os.environ, PYTHONPATH=os.pathsep.join([hooks_dir, REPO_ROOT]), FAKE_DISCORD_PORT=str(fake.port))
+            # Only .env may ask for a cluster
+            for name in ("CLUSTER_WORKERS", "WORKER_ID", "SHARD_IDS", "SHARD_COUNT"):
+                env.pop(name, None)
+            started = time.perf_counter()
+            process = await asyncio.create_subprocess_exec(sys.executable, "bot.py", cwd=app_dir, env=env,
+                                                           stdout=subprocess.DEVNULL, start_new_session=True)
+            deadline = started + 60
+            while sum(fake.mute_edits[key] > 0 for key in keys) < len(keys):
+                if process.returncode is not None or time.perf_counter() > deadline:
+                    raise RuntimeError("bot.py cluster didn't unmute every overdue member "
+                                       f"({sum(fake.identified.values())} shard sessions started)")
+                await asyncio.sleep(0.1)
+            unmuted = time.perf_counter() - started
+            process.send_signal(signal.SIGTERM)
+            code = await asyncio.wait_for(process.wait(), 60)
+            logged = sum(os.path.getsize(os.path.join(directory, name)) // RECORD.size
+                         for directory, _, names in os.walk(os.environ["MOD_LOG_DIR"])
+                         for name in names if name.endswith(".log"))
+    finally:
+        if process is not None and process.returncode is None:
+            os.killpg(process.pid, signal.SIGKILL)
+        await fake.stop()
+
+    sessions = sum(fake.identified.values())
+    row = {"workers": args.cluster_workers, "shards": args.cluster_shards, "shard_sessions": sessions,
+           "timed_mutes": len(records), "unmuted": sum(fake.mute_edits[key] > 0 for key in keys),
+           "unmuted_s": round(unmuted, 3), "logged": logged, "exit_code": code}
+    report("Cluster via bot.py", [row], list(row))
+    row["extra_sessions"] = sessions - args.cluster_shards
+    row["not_logged"] = len(records) - logged
+    require_zero("Cluster via bot.py", row, ("extra_sessions", "not_logged", "exit_code"))
+    return row
+
+
+async def bench_history(args):
+    """Moderation log write throughput, query latency and memory with many stored events
+
+    Queries cover targets with recent events and ones with none, which have
+    to search every segment's index.
+    """
+    from utils.mod_log import BATCH_SIZE, ModLog
+
+    rng = random.Random(0)
+    targets = 100000
+    with tempfile.TemporaryDirectory() as data_dir:
+        path = os.path.join(data_dir, "mod_log")
+        mod_log = ModLog(path)
+        started = time.perf_counter()
+        timestamp = time.time() - args.history_events
+        for i in range(args.history_events):
+            mod_log.record(i % 10, rng.randrange(targets), 1, "mute" if i % 2 else "unmute", 600, timestamp + i)
+            # Flushed a batch at a time, as the background task does under load
+            if (i + 1) % BATCH_SIZE == 0:
+                await mod_log.flush()
+        await mod_log.close()
+        write_s = time.perf_counter() - started
+
+        # Reopened as after a restart; memory doesn't grow with the stored history
+        tracemalloc.start()
+        mod_log = ModLog(path)
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        segments = len(mod_log._sealed) + 1
+
+        rows = []
+        for kind, target_range in (("known", (0, targets)), ("unknown", (targets, 2 * targets))):
+            latencies = []
+            for _ in range(200):
+                started = time.perf_counter()
+                mod_log.history(rng.randrange(10), rng.randrange(*target_range), 10)
+                latencies.append(time.perf_counter() - started)
+            rows.append({"events": args.history_events, "targets": kind, "segments": segments,
+                         "events_per_s": round(args.history_events / write_s), "memory_mb": round(memory / 1024 / 1024, 1),
+                         "query_p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+                         "query_p99_ms": round(percentile(latencies, 0.99) * 1000, 2)})
+        await mod_log.close()
+    report("Moderation history", rows, list(rows[0]))
+    return {"history": rows}
+
+
+async def bench_reload(args):
+    """Hot-reloading every cog with /reload while timed mutes are pending
+
+    Pending unmutes must survive the reloads and still fire afterwards; the
+    suite fails otherwise.
+    """
+    fake = FakeDiscord(edit_latency=args.edit_latency)
+    await fake.start()
+    guild_id, (channel_id,) = fake.add_guild(voice_channels=(args.reload_mutes,), muted_fraction=0.0)
+    with tempfile.TemporaryDirectory() as data_dir, quiet():
+        configure_env(data_dir)
+        instance, task = await start_bot(fake)
+        try:
+            member_ids = [member_id for member_id in fake.guilds[guild_id]["voice_states"]]
+            # Long enough that none fire before the reloads are done
+            await run_commands(fake, guild_id, [("mute", {"member": ("member", member_id), "duration": "10s"})
+                                                for member_id in member_ids], args.concurrency)
+            pending_before = len(instance.unmute_scheduler)
+            rows = []
+            for name in instance.cog_loader.discover():
+                latency = await asyncio.wait_for(fake.send_interaction(guild_id, "reload", cog=name), 60)
+                import_ms, setup_ms = instance.cog_loader.timings[name]
+                rows.append({"cog": name, "reload_ms": round(latency * 1000, 2), "import_ms": import_ms, "setup_ms": setup_ms})
+            pending_after = len(instance.unmute_scheduler)
+            deadline = time.perf_counter() + 40
+            while fake.mute_counts(guild_id)[0] and time.perf_counter() < deadline:
+                await asyncio.sleep(0.1)
+            still_muted = fake.mute_counts(guild_id)[0]
+            await check_voice_index(instance)
+        finally:
+            await stop_bot(instance, task)
+            await fake.stop()
+
+    report("Cog reload", rows, list(rows[0]))
+    row = {"timed_mutes": len(member_ids), "pending_before": pending_before, "pending_after": pending_after,
+           "still_muted": still_muted}
+    report("State across reloads", [row], list(row))
+    row["not_pending"] = len(member_ids) - pending_before
+    row["dropped"] = pending_before - pending_after
+    require_zero("State across reloads", row, ("not_pending", "dropped", "still_muted"))
+    return {"reload": {"cogs": rows, "state": row}}
+
+
+def legacy_parse_duration(duration_str):
+    """The single-token parser /mute used before compound durations, for comparison"""
+    import re
+    from datetime import timedelta
+
+    match = re.fullmatch(r"(\d+)([smhd])", duration_str.lower())
+    if not match:
+        return None
+    value, unit = int(match.group(1)), match.group(2)
+    keyword = {"s": "seconds", "m": "minutes", "h": "hours", "d": "days"}[unit]
+    return timedelta(**{keyword: value})
+
+
+async def bench_parser(args):
+    """Duration parser throughput, a randomized round-trip check, and /mute autocomplete under typing load
+
+    The round trip formats random durations and parses them back, which must
+    give the same number of seconds, and random partial input must give valid
+    suggestions without raising; they stand in for property-based tests.
+    Autocomplete requests arrive at a steady rate, one per keystroke, and
+    have to be answered within Discord's 3 second window.
+    """
+    from utils.time_parser import _parse_seconds, format_duration, parse_duration, suggest_durations
+
+    rng = random.Random(0)
+    units = "smhdw"
+
+    def timed(parse, strings):
+        started = time.perf_counter()
+        for string in strings:
+            parse(string)
+        return round((time.perf_counter() - started) / len(strings) * 1e6, 3)
+
+    single = [f"{rng.randrange(1, 10 ** 6)}{rng.choice('smhd')}" for _ in range(args.parser_strings)]
+    compound = [format_duration(rng.randrange(1, 10 ** 7), None) for _ in range(args.parser_strings)]
+    hot = single[:1000] * (args.parser_strings // 1000)
+    _parse_seconds.cache_clear()
+    rows = [{"parser": "legacy", "input": "single unit", "us_per_parse": timed(legacy_parse_duration, single)}]
+    for name, strings in (("single unit", single), ("compound", compound)):
+        _parse_seconds.cache_clear()
+        rows.append({"parser": "cached", "input": f"{name}, cold", "us_per_parse": timed(parse_duration, strings)})
+    rows.append({"parser": "cached", "input": "single unit, repeated", "us_per_parse": timed(parse_duration, hot)})
+    report("Duration parser", rows, list(rows[0]))
+
+    mismatches = 0
+    for _ in range(args.parser_strings):
+        seconds = rng.randrange(1, 10 ** 9)
+        text = format_duration(seconds, None)
+        # Spaces after a unit and upper case must not change the result
+        unit = rng.choice(units)
+        spaced = text.replace(unit, unit + " ").upper()
+        if parse_duration(text) != parse_duration(spaced) or parse_duration(text).total_seconds() != seconds:
+            mismatches += 1
+
+    # Whatever is typed, suggestions must not raise and must parse within the maximum
+    max_seconds = 28 * 86400
+    suggestion_errors = 0
+    typed_inputs = ["x5", "1.5", "1h30x5", "5x", "h5", "-1", "1 h 3"]
+    typed_inputs += ["".join(rng.choice("0123456789smhdwx. ") for _ in range(rng.randrange(1, 12))) for _ in range(args.parser_strings)]
+    for text in typed_inputs:
+        try:
+            suggestions = suggest_durations(text, max_seconds)
+        except Exception:
+            suggestion_errors += 1
+            continue
+        if any(parse_duration(value) is None or not 0 < seconds <= max_seconds for value, seconds in suggestions):
+            suggestion_errors += 1
+    if any(suggest_durations(text, max_seconds) for text in ("x5", "1.5", "1h30x5")):
+        suggestion_errors += 1
+
+    fake = FakeDiscord()
+    await fake.start()
+    guild_id, _ = fake.add_guild(voice_channels=(10,))
+    typed = ["", "1", "1h", "1h3", "1h30", "1h30m", "2", "2w", "9", "90", "90s", "1d", "1d1", "1d12", "1d12h"]
+    with tempfile.TemporaryDirectory() as data_dir, quiet():
+        configure_env(data_dir)
+        instance, task = await start_bot(fake)
+        try:
+            fake.reset_counters()
+            started = time.perf_counter()
+            requests = []
+            for i in range(args.autocomplete_requests):
+                requests.append(asyncio.wait_for(
+                    fake.send_interaction(guild_id, "mute", focused="duration", duration=typed[i % len(typed)]), 30))
+                # Sent in 10 ms ticks at --autocomplete-rate per second
+                if i % max(1, args.autocomplete_rate // 100) == 0:
+                    await asyncio.sleep(0.01)
+            latencies = await asyncio.gather(*requests)
+            wall = time.perf_counter() - started
+            empty = sum(1 for choices in fake.autocomplete_choices if not choices)
+        finally:
+            await stop_bot(instance, task)
+            await fake.stop()
+
+    row = {"requests": args.autocomplete_requests, "rate_per_s": args.autocomplete_rate, "wall_s": round(wall, 3),
+           "p50_ms": round(percentile(latencies, 0.50) * 1000, 2), "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+           "max_ms": round(max(latencies) * 1000, 2), "over_3s": sum(1 for latency in latencies if latency > 3),
+           "empty_responses": empty, "round_trip_checks": args.parser_strings, "round_trip_mismatches": mismatches,
+           "suggestion_checks": len(typed_inputs), "suggestion_errors": suggestion_errors}
+    report("Duration autocomplete", [row], list(row))
+    require_zero("Duration parser", row, ("over_3s", "empty_responses", "round_trip_mismatches", "suggestion_errors"))
+    return {"parser": {"parse": rows, "autocomplete": row}}
+
+
+async def bench_breaker(args):
+    """Circuit breaker recovery: a half-open trial that gets a 429 must not leave the breaker stuck open
+
+    A run of 503s opens the breaker. After the cooldown the trial edit is
+    rate limited past discord.py's own retries, and both that edit's retry and
+    the next edit have to go through.
+    """
+    from utils.resilience import CircuitOpenError
+
+    fake = FakeDiscord(inject_5xx=1.0)
+    await fake.start()
+    guild_id, (channel_id,) = fake.add_guild(voice_channels=(10,))
+    with tempfile.TemporaryDirectory() as data_dir, quiet():
+        configure_env(data_dir, BREAKER_FAILURE_THRESHOLD=2, BREAKER_COOLDOWN=1)
+        instance, task = await start_bot(fake)
+        try:
+            guild = instance.get_guild(guild_id)
+            members = [member for member in guild.get_channel(channel_id).members if member.id != guild.me.id]
+            editor = instance.member_editor
+            outage = await editor.edit_one(members[0], True, "Benchmark")
+            breaker = editor.breaker(guild_id)
+            opened = breaker.state
+
+            fake.inject_5xx = 0.0
+            await asyncio.sleep(breaker.retry_in() + 0.1)
+            # discord.py retries a 429 five times itself before raising it
+            fake.force_429 = 5
+            trial = await editor.edit_one(members[1], True, "Benchmark")
+            after = await editor.edit_one(members[2], True, "Benchmark")
+            state = breaker.state
+        finally:
+            await stop_bot(instance, task)
+            await fake.stop()
+
+    row = {"outage_error": type(outage.error).__name__, "opened": opened,
+           "trial_429_then": trial.status, "next_edit": after.status, "breaker_after": state}
+    report("Circuit breaker recovery", [row], list(row))
+    if opened != "open" or trial.status != "ok" or after.status != "ok" or state != "closed":
+        raise RuntimeError(f"Circuit breaker did not recover after a rate-limited trial: {row}"
+                           + (" (still open)" if isinstance(after.error, CircuitOpenError) else ""))
+    return {"breaker": row}
+
+
+SUITES = {
+    "commands": bench_commands,
+    "bulk": bench_bulk,
+    "conflicts": bench_conflicts,
+    "breaker": bench_breaker,
+    "scheduler": bench_scheduler,
+    "reconcile": bench_reconcile,
+    "startup": bench_startup,
+    "cluster": bench_cluster,
+    "history": bench_history,
+    "reload": bench_reload,
+    "parser": bench_parser,
+}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("suites", nargs="*", help=f"Suites to run: {', '.join(SUITES)} (default: all)")
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--edit-latency", type=float, default=0.02, help="Fake member edit latency in seconds")
+    parser.add_argument("--inject-429", type=float, default=0.0, help="Fraction of member edits answered with 429")
+    parser.add_argument("--inject-5xx", type=float, default=0.0, help="Fraction of member edits answered with 503")
+    parser.add_argument("--rate-limit", type=int, default=None, help="Member edits allowed per guild per second")
+    parser.add_argument("--concurrency", type=int, default=20, help="Concurrent commands in the commands suite")
+    parser.add_argument("--mutes", type=int, default=500, help="Members muted and unmuted in the commands suite")
+    parser.add_argument("--channel-size", type=int, default=200, help="Channel size for /mutechannel in the commands suite")
+    parser.add_argument("--bulk-sizes", type=int, nargs="+", default=[100, 500, 1000])
+    parser.add_argument("--bulk-concurrency", type=int, default=5, help="BULK_EDIT_CONCURRENCY compared against serial edits")
+    parser.add_argument("--conflicts", type=int, default=5000, help="Mute/unmute requests in the conflicts suite")
+    parser.add_argument("--conflict-members", type=int, default=200, help="Members those requests are spread over")
+    parser.add_argument("--scheduled", type=int, default=100000, help="Timed mutes in the scheduler suite")
+    parser.add_argument("--scheduler-spread", type=float, default=3.0, help="Seconds over which scheduled mutes expire")
+    parser.add_argument("--records", type=int, default=50000, help="Persisted timed mutes in the reconcile suite")
+    parser.add_argument("--guild-members", type=int, default=100000, help="Members in the startup suite's guild")
+    parser.add_argument("--parser-strings", type=int, default=100000, help="Durations parsed per case in the parser suite")
+    parser.add_argument("--autocomplete-requests", type=int, default=5000, help="/mute autocomplete requests in the parser suite")
+    parser.add_argument("--autocomplete-rate", type=int, default=500, help="Autocomplete requests sent per second")
+    parser.add_argument("--reload-mutes", type=int, default=100, help="Timed mutes pending while the reload suite reloads cogs")
+    parser.add_argument("--history-events", type=int, default=1000000, help="Events stored in the history suite")
+    parser.add_argument("--cluster-workers", type=int, default=2, help="Worker processes in the cluster suite")
+    parser.add_argument("--cluster-shards", type=int, default=4, help="Shards split between those workers")
+    parser.add_argument("--cluster-guilds", type=int, default=8, help="Guilds in the cluster suite, spread over the shards")
+    parser.add_argument("--cluster-members", type=int, default=50, help="Timed mutes per guild in the cluster suite")
+    parser.add_argument("--mode", default="full", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--report-dir", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+async def main(argv=None):
+    args = parse_args(argv)
+    if args.suites == ["startup-worker"]:
+        await startup_worker(args)
+        return
+    if args.suites == ["cluster-worker"]:
+        await cluster_worker(args)
+        return
+
+    unknown = [name for name in args.suites if name not in SUITES]
+    if unknown:
+        raise SystemExit(f"Unknown suite(s): {', '.join(unknown)}")
+
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+    results = {}
+    for name in args.suites or SUITES:
+        results.update(await SUITES[name](args))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
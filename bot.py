@@ -1,85 +1,282 @@
 import discord
 from discord.ext import commands
+from discord import app_commands
 import os
+import sys
+import time
 from dotenv import load_dotenv
-import traceback
+import logging
 import asyncio
+from utils.member_editor import MemberEditor, DEFAULT_CONCURRENCY
+from utils.resilience import DEFAULT_FAILURE_THRESHOLD, DEFAULT_COOLDOWN
+from utils.unmute_scheduler import UnmuteScheduler
+from utils.mute_store import DEFAULT_STORE_PATH
+from utils.coordination import ShardView, open_backend, shard_for
+from utils.cluster import run_cluster, run_until_signalled
+from utils.job_store import JobStore, DEFAULT_JOB_STORE_PATH
+from utils.job_queue import JobQueue, DEFAULT_JOB_CONCURRENCY
+from utils.voice_index import VoiceStateIndex
+from utils.mod_log import ModLog, DEFAULT_MOD_LOG_DIR, DEFAULT_MAX_SEGMENTS
+from utils.cog_loader import CogLoader, DEFAULT_WATCH_INTERVAL
+from utils.time_parser import parse_duration, DEFAULT_MAX_MUTE_DURATION
+from utils.command_sync import CommandSyncCache, sync_if_changed, DEFAULT_CACHE_PATH
+from utils.metrics import Metrics, MetricsServer, RateLimitLogHandler
+from utils.log import setup_logging, elapsed_ms
 
 # Load environment variables
 load_dotenv()
 
+log = logging.getLogger("bot")
+
 # Set bot permissions
 intents = discord.Intents.default()
 intents.voice_states = True  # Required for accessing voice states and channel members
 intents.members = True     # Recommended for accessing all member information
 
-class BlackWolfManager(commands.Bot):
+def member_cache_options():
+    """Member cache settings for the configured MEMBER_CACHE_MODE
+
+    "lean" keeps only members currently in voice and skips chunking every guild
+    at startup; anyone else a command needs is fetched on demand.
+    """
+    mode = os.getenv("MEMBER_CACHE_MODE", "full").lower()
+    if mode == "lean":
+        return {
+            "member_cache_flags": discord.MemberCacheFlags(voice=True, joined=False),
+            "chunk_guilds_at_startup": False,
+        }
+    if mode != "full":
+        log.warning("Unknown MEMBER_CACHE_MODE '%s', using full member cache.", mode)
+    return {}
+
+def shard_options():
+    """Shards this process runs, from the SHARD_IDS/SHARD_COUNT the cluster launcher sets
+
+    Without them AutoShardedBot runs every shard Discord recommends in this process.
+    """
+    shard_count = os.getenv("SHARD_COUNT")
+    if not shard_count:
+        return {}
+    options = {"shard_count": int(shard_count)}
+    shard_ids = os.getenv("SHARD_IDS")
+    if shard_ids:
+        options["shard_ids"] = [int(shard_id) for shard_id in shard_ids.split(",")]
+    return options
+
+class CommandTree(app_commands.CommandTree):
+    """Command tree that timestamps each interaction for the latency metrics"""
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        interaction.extras["started_at"] = time.perf_counter()
+        return True
+
+class BlackWolfManager(commands.AutoShardedBot):
     """BlackWolf Manager Discord Bot"""
     
     def __init__(self):
-        super().__init__(command_prefix='!', intents=intents)
-        # For tracking timed mute tasks, key: (guild_id, member_id), value: asyncio.Task
-        self.timed_mute_tasks = {}
+        super().__init__(command_prefix='!', intents=intents, tree_cls=CommandTree, **member_cache_options(), **shard_options())
+        # Startup to first on_ready, logged and served as a metric
+        self.started_at = time.perf_counter()
+        self.ready_after = None
+        # Concurrent cog loading with per-module timings, and /reload
+        self.cog_loader = CogLoader(self)
+        # Longest duration /mute accepts
+        self.max_mute_duration = parse_duration(os.getenv("MAX_MUTE_DURATION") or DEFAULT_MAX_MUTE_DURATION)
+        if self.max_mute_duration is None:
+            log.warning("MAX_MUTE_DURATION must be a duration like 28d or 1w, using default %s.", DEFAULT_MAX_MUTE_DURATION)
+            self.max_mute_duration = parse_duration(DEFAULT_MAX_MUTE_DURATION)
+        # Command latency, member edit outcomes and scheduler lag, served on METRICS_PORT if set
+        self.metrics = Metrics()
+        self.metrics_server = None
+        self.rate_limit_log = RateLimitLogHandler.install(self.metrics)
+        # Pending timed unmutes keyed by (guild_id, member_id), persisted across restarts. In a cluster
+        # the backend is shared and each worker only restores the guilds on its own shards.
+        backend = open_backend(os.getenv("COORDINATION_BACKEND", "sqlite"), os.getenv("MUTE_STORE_PATH") or DEFAULT_STORE_PATH)
+        self.mute_store = backend if self.shard_ids is None else ShardView(backend, self.shard_ids, self.shard_count)
+        self.unmute_scheduler = UnmuteScheduler(store=self.mute_store, metrics=self.metrics)
+        self.metrics.gauge("bot_startup_seconds", "Seconds from startup to the first on_ready", lambda: self.ready_after or 0)
+        self.metrics.gauge("bot_pending_timed_unmutes", "Timed unmutes waiting to fire", lambda: len(self.unmute_scheduler))
+        # Who is muted in which voice channel, kept current by the voice_status cog
+        self.voice_index = VoiceStateIndex(self.unmute_scheduler)
+        # Shared engine for member voice edits, concurrency and circuit breakers are per guild and edits are coordinated per member
+        self.member_editor = MemberEditor(
+            self._env_int("BULK_EDIT_CONCURRENCY", DEFAULT_CONCURRENCY), metrics=self.metrics, scheduler=self.unmute_scheduler,
+            failure_threshold=self._env_int("BREAKER_FAILURE_THRESHOLD", DEFAULT_FAILURE_THRESHOLD),
+            breaker_cooldown=float(self._env_int("BREAKER_COOLDOWN", int(DEFAULT_COOLDOWN))),
+        )
+        self.metrics.gauge("bot_open_circuit_breakers", "Guilds whose member edits are paused by the circuit breaker",
+                           self.member_editor.open_breakers)
+        # Background /muteall and /unmuteall jobs, checkpointed so they resume after a restart
+        self.job_store = JobStore(os.getenv("JOB_STORE_PATH") or DEFAULT_JOB_STORE_PATH)
+        self.job_queue = JobQueue(self, self.job_store, self._env_int("JOB_CONCURRENCY", DEFAULT_JOB_CONCURRENCY))
+        self.metrics.gauge("bot_running_jobs", "Mute jobs running or waiting to start", lambda: len(self.job_queue))
+        # Mute/unmute history for /mutehistory. Cluster workers each keep their own, a guild's
+        # commands always reach the worker running its shard.
+        mod_log_dir = os.getenv("MOD_LOG_DIR") or DEFAULT_MOD_LOG_DIR
+        if os.getenv("WORKER_ID"):
+            mod_log_dir = os.path.join(mod_log_dir, f"worker-{os.getenv('WORKER_ID')}")
+        self.mod_log = ModLog(mod_log_dir, max_segments=self._env_int("MOD_LOG_MAX_SEGMENTS", DEFAULT_MAX_SEGMENTS))
+
+    def owns_guild(self, guild_id: int) -> bool:
+        """Whether this process runs the shard that receives a guild's events"""
+        return self.shard_ids is None or shard_for(guild_id, self.shard_count) in self.shard_ids
+
+    async def add_cog(self, cog, /, **kwargs):
+        # Marks the end of the extension's import for the cog loader's timings
+        self.cog_loader.setup_started(type(cog).__module__)
+        await super().add_cog(cog, **kwargs)
+
+    @staticmethod
+    def _env_int(name, default):
+        """Read an integer setting from the environment, falling back to default"""
+        value = os.getenv(name)
+        if not value:
+            return default
+        try:
+            return int(value)
+        except ValueError:
+            log.warning("%s must be an integer, using default %s.", name, default)
+            return default
         
     async def setup_hook(self):
         """Bot initialization hook for loading Cog modules"""
-        # Load all Cog modules
-        for cog_file in os.listdir("cogs"):
-            if cog_file.endswith(".py"):
-                cog_name = cog_file[:-3]  # Remove .py extension
-                try:
-                    await self.load_extension(f"cogs.{cog_name}")
-                    print(f"Loaded module: {cog_name}")
-                except Exception as e:
-                    print(f"Error loading module {cog_name}: {e}")
-                    traceback.print_exc()
-    
-    async def on_ready(self):
-        """Event handler when bot is ready"""
-        print(f'{self.user.name} has connected to Discord!')
-        print(f'Bot ID: {self.user.id}')
-        print('------')
+        # Load all Cog modules concurrently, each one's import and setup time is logged
+        await self.cog_loader.load_all()
+        if os.getenv("COG_WATCH", "").lower() in ("1", "true", "yes"):
+            # Development mode: reload cogs as their files change
+            self.cog_loader.watch(float(self._env_int("COG_WATCH_INTERVAL", int(DEFAULT_WATCH_INTERVAL))))
+            log.info("Watching cogs for changes.")
+
+        # Restore timed mutes left over from the previous run, overdue ones are unmuted once ready
+        try:
+            restored = self.unmute_scheduler.load()
+            log.info("Restored %d pending timed unmutes.", restored)
+        except Exception:
+            log.exception("Error restoring timed unmutes")
+        self.unmute_scheduler.start()
+        self.mod_log.start()
+
+        # Jobs interrupted by the last shutdown pick up where they stopped once ready
+        try:
+            resumed = self.job_queue.resume()
+            if resumed:
+                log.info("Resuming %d unfinished mute jobs.", resumed)
+        except Exception:
+            log.exception("Error resuming mute jobs")
+
+        metrics_port = self._env_int("METRICS_PORT", None)
+        if metrics_port:
+            # Cluster workers each serve on their own port
+            metrics_port += self._env_int("WORKER_ID", 0)
+            self.metrics_server = MetricsServer(self.metrics, host=os.getenv("METRICS_HOST") or "127.0.0.1", port=metrics_port)
+            try:
+                await self.metrics_server.start()
+                log.info("Serving metrics on http://%s:%d/metrics", self.metrics_server.host, metrics_port)
+            except OSError as e:
+                log.error("Error starting metrics server on port %d: %s", metrics_port, e)
+                self.metrics_server = None
+
+        # Sync slash commands once per process rather than on every (re)connect
+        await self.sync_commands()
+
+    def record_command_latency(self, interaction: discord.Interaction):
+        """Record the time from invocation to the command's final response"""
+        started_at = interaction.extras.get("started_at")
+        if started_at is not None and interaction.command is not None:
+            self.metrics.command_latency.observe(time.perf_counter() - started_at, interaction.command.qualified_name)
+            log.info("Command finished", extra={
+                "command": interaction.command.qualified_name,
+                "guild": interaction.guild_id,
+                "member": interaction.user.id,
+                "latency_ms": elapsed_ms(started_at),
+            })
+
+    async def on_app_command_completion(self, interaction: discord.Interaction, command):
+        self.record_command_latency(interaction)
+
+    async def sync_commands(self):
+        """Sync slash commands, skipping the API call if they haven't changed since the last sync"""
+        if self.shard_ids is not None and 0 not in self.shard_ids:
+            log.info("Slash commands are synced by the worker running shard 0.")
+            return
+        force = "--force-sync" in sys.argv or os.getenv("FORCE_COMMAND_SYNC", "").lower() in ("1", "true", "yes")
+        cache = CommandSyncCache(os.getenv("COMMAND_SYNC_CACHE_PATH") or DEFAULT_CACHE_PATH)
         try:
             test_guild_id = os.getenv("TEST_GUILD_ID")
             if test_guild_id:
                 try:
                     test_guild_id = int(test_guild_id)
                     guild = discord.Object(id=test_guild_id)
-                    await self.tree.sync(guild=guild)
-                    print(f'Slash commands synced to test server {test_guild_id}!')
+                    if await sync_if_changed(self.tree, cache, guild=guild, force=force) is None:
+                        log.info("Slash commands for test server %d unchanged, skipping sync.", test_guild_id)
+                    else:
+                        log.info("Slash commands synced to test server %d!", test_guild_id)
+                    return
                 except (ValueError, discord.NotFound):
-                    print("Warning/Error: TEST_GUILD_ID is invalid or server not found, attempting global sync.")
-                    synced = await self.tree.sync()
-                    print(f'Synced {len(synced)} slash commands globally (may take time to propagate)!')
+                    log.warning("TEST_GUILD_ID is invalid or server not found, attempting global sync.")
+            else:
+                log.info("TEST_GUILD_ID environment variable not found, performing global sync...")
+
+            synced = await sync_if_changed(self.tree, cache, force=force)
+            if synced is None:
+                log.info("Global slash commands unchanged, skipping sync.")
             else:
-                print("TEST_GUILD_ID environment variable not found, performing global sync...")
-                synced = await self.tree.sync()
-                print(f'Synced {len(synced)} slash commands globally (may take time to propagate)!')
+                log.info("Synced %d slash commands globally (may take time to propagate)!", len(synced))
+
+        except Exception:
+            log.exception("Error syncing slash commands")
 
-        except Exception as e:
-            print(f"Error syncing slash commands: {e}")
-            traceback.print_exc()
+    async def close(self):
+        self.cog_loader.stop()
+        self.unmute_scheduler.stop()
+        await self.job_queue.stop()
+        if self.metrics_server is not None:
+            await self.metrics_server.stop()
+        self.rate_limit_log.uninstall()
+        await super().close()
+        self.mute_store.close()
+        self.job_store.close()
+        await self.mod_log.close()
+    
+    async def on_ready(self):
+        """Event handler when bot is ready"""
+        log.info("%s has connected to Discord! Bot ID: %s", self.user.name, self.user.id)
+        if self.ready_after is None:
+            self.ready_after = time.perf_counter() - self.started_at
+            log.info("Ready %.2fs after startup.", self.ready_after)
 
 # Run the bot
 if __name__ == "__main__":
-    bot = BlackWolfManager()
+    log_listener = setup_logging(
+        level=os.getenv("LOG_LEVEL", "INFO").upper(),
+        fmt=os.getenv("LOG_FORMAT", "json").lower(),
+        sample_burst=BlackWolfManager._env_int("LOG_SAMPLE_BURST", 5),
+        sample_window=float(BlackWolfManager._env_int("LOG_SAMPLE_WINDOW", 10)),
+    )
+    cluster_workers = BlackWolfManager._env_int("CLUSTER_WORKERS", 1)
+    bot = BlackWolfManager() if cluster_workers <= 1 else None
     try:
         token = os.getenv('DISCORD_TOKEN')
         if not token:
-            print("Error: DISCORD_TOKEN not found in .env file or environment variables")
+            log.error("DISCORD_TOKEN not found in .env file or environment variables")
+        elif bot is None:
+            shard_count = BlackWolfManager._env_int("SHARD_COUNT", cluster_workers)
+            log.info("Starting cluster of %d workers for %d shards...", cluster_workers, shard_count)
+            codes = asyncio.run(run_cluster([sys.executable, os.path.abspath(__file__), *sys.argv[1:]], cluster_workers, shard_count))
+            if any(codes):
+                log.error("Workers exited with codes %s.", codes)
+                sys.exit(1)
         else:
-            print("Starting bot...")
-            bot.run(token)
+            log.info("Starting bot...")
+            # Logging is already routed through our queue, so discord.py's own handler isn't set up;
+            # SIGINT and SIGTERM close the bot so buffered history and job progress are saved
+            asyncio.run(run_until_signalled(bot, token))
     except discord.errors.PrivilegedIntentsRequired:
-        print("\n" + "="*60)
-        print("Error: Missing required Privileged Gateway Intents!")
-        print("Please ensure 'SERVER MEMBERS INTENT' and 'VOICE STATE INTENT' are enabled in the Discord Developer Portal.")
-        print("="*60 + "\n")
+        log.error("Missing required Privileged Gateway Intents! Please ensure 'SERVER MEMBERS INTENT' and "
+                  "'VOICE STATE INTENT' are enabled in the Discord Developer Portal.")
     except discord.errors.LoginFailure:
-        print("\n" + "="*60)
-        print("Error: Unable to login - Invalid Token!")
-        print("Please check your DISCORD_TOKEN.")
-        print("="*60 + "\n")
-    except Exception as e:
-        print(f"\nUnexpected error occurred while starting the bot: {e}")
-        traceback.print_exc()
\ No newline at end of file
+        log.error("Unable to login - Invalid Token! Please check your DISCORD_TOKEN.")
+    except Exception:
+        log.exception("Unexpected error occurred while starting the bot")
+    finally:
+        log_listener.stop()
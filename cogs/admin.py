@@ -0,0 +1,51 @@
+import discord
+from discord.ext import commands
+from discord import app_commands
+import logging
+
+log = logging.getLogger(__name__)
+
+async def is_owner(interaction: discord.Interaction) -> bool:
+    """App command check for the bot's owner (or team members)"""
+    return await interaction.client.is_owner(interaction.user)
+
+class AdminCog(commands.Cog):
+    """Owner-only maintenance commands"""
+
+    def __init__(self, bot):
+        self.bot = bot
+
+    async def extension_autocomplete(self, interaction: discord.Interaction, current: str):
+        return [app_commands.Choice(name=name, value=name) for name in self.bot.cog_loader.discover()
+                if current.lower() in name.lower()][:25]
+
+    @app_commands.command(name="reload", description="Reload a cog without restarting the bot (owner only)")
+    @app_commands.describe(cog="Cog to reload, e.g. user_mute")
+    @app_commands.autocomplete(cog=extension_autocomplete)
+    @app_commands.check(is_owner)
+    async def reload(self, interaction: discord.Interaction, cog: str):
+        """Hot-reload an extension; pending unmutes, jobs and caches live on the bot and are kept"""
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        name = self.bot.cog_loader.resolve(cog)
+        try:
+            import_ms, setup_ms = await self.bot.cog_loader.reload(name)
+        except commands.ExtensionNotLoaded:
+            await interaction.followup.send(f"🤔 `{name}` is not loaded.", ephemeral=True)
+            return
+        except commands.ExtensionError as e:
+            log.error("Reloading %s failed", name, exc_info=e, extra={"command": "reload", "extension": name})
+            await interaction.followup.send(
+                f"⚠️ Reloading `{name}` failed, the previous version is still running: {type(e.__cause__ or e).__name__}",
+                ephemeral=True,
+            )
+            return
+
+        # Only calls Discord if the reloaded cog's commands changed
+        await self.bot.sync_commands()
+        await interaction.followup.send(
+            f"♻️ Reloaded `{name}` in {import_ms + setup_ms:.1f} ms (import {import_ms:.1f} ms, setup {setup_ms:.1f} ms).",
+            ephemeral=True,
+        )
+
+async def setup(bot):
+    await bot.add_cog(AdminCog(bot))
@@ -1,7 +1,12 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
-import traceback
+import logging
+from utils.members import resolve_members
+from utils.progress import BulkProgress
+from utils.resilience import CircuitOpenError
+
+log = logging.getLogger(__name__)
 
 class ChannelMuteCog(commands.Cog):
     """Channel mute related commands"""
@@ -9,6 +14,12 @@ class ChannelMuteCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
 
+    @staticmethod
+    async def _members_from_ids(guild: discord.Guild, member_ids):
+        """Resolve indexed member IDs to members, skipping the bot itself"""
+        members = await resolve_members(guild, list(member_ids))
+        return [member for member in members if member.id != guild.me.id]
+
     @app_commands.command(name="mutechannel", description="Mute all users (except bots) in a specified voice channel")
     @app_commands.describe(channel="Select a voice channel to mute users in")
     @app_commands.checks.has_permissions(mute_members=True)
@@ -22,32 +33,42 @@ class ChannelMuteCog(commands.Cog):
 
         muted_count = 0
         error_messages = []
-        # Filter out already muted members and the bot itself
-        members_to_mute = [m for m in channel.members if m != interaction.guild.me and (not m.voice or not m.voice.mute)]
+        # Only unmuted members need muting, excluding the bot itself
+        members_to_mute = await self._members_from_ids(interaction.guild, self.bot.voice_index.unmuted_in(interaction.guild.id, channel.id))
 
         if not members_to_mute:
             await interaction.followup.send(f"No users need to be muted in {channel.mention}.", ephemeral=True)
             return
 
-        for member in members_to_mute:
-            # Check if they're still in voice before muting
-            if member.voice:
-                try:
-                    await member.edit(mute=True, reason=f"Muted by {interaction.user} using /mutechannel")
-                    muted_count += 1
-                except discord.Forbidden:
-                    error_messages.append(f"❌ No permission to mute {member.display_name}")
-                except Exception as e:
-                    error_messages.append(f"⚠️ Error muting {member.display_name}: {type(e).__name__}")
-                    print(f"Error muting {member.display_name} ({member.id}): {e}")
-            else:
+        progress = BulkProgress(interaction, f"Muting users in {channel.mention}", len(members_to_mute))
+        progress.start()
+        results = await self.bot.member_editor.bulk_edit_mute(
+            members_to_mute, True, reason=f"Muted by {interaction.user} using /mutechannel", on_result=progress.add
+        )
+        for member, status, error in results:
+            if status == "ok":
+                self.bot.mod_log.record(member.guild.id, member.id, interaction.user.id, "mute")
+                muted_count += 1
+            elif status == "forbidden":
+                error_messages.append(f"❌ No permission to mute {member.display_name}")
+            elif status == "left":
                 error_messages.append(f"ℹ️ {member.display_name} left the voice channel before being muted.")
-
-        response_message = f"✅ In {channel.mention}, attempted to mute {len(members_to_mute)} users, {muted_count} successful."
-        if error_messages:
-            response_message += "\n**Details:**\n" + "\n".join(error_messages)
-
-        await interaction.followup.send(response_message, ephemeral=True)
+            elif status == "superseded":
+                error_messages.append(f"🔁 {member.display_name} was unmuted by another command at the same time.")
+            elif isinstance(error, CircuitOpenError):
+                error_messages.append(f"⏸️ Skipped {member.display_name}: member edits are paused after repeated Discord errors.")
+            else:
+                error_messages.append(f"⚠️ Error muting {member.display_name}: {type(error).__name__}")
+                # Sampled, a failing channel would otherwise log once per member
+                log.warning("Error muting %s: %s", member.display_name, error, extra={
+                    "command": "mutechannel", "guild": member.guild.id, "member": member.id,
+                    "sample_key": ("mutechannel", member.guild.id, type(error).__name__),
+                })
+
+        # Paginated, big channels can have more details than fit in one message
+        await progress.finish(
+            f"✅ In {channel.mention}, attempted to mute {len(members_to_mute)} users, {muted_count} successful.", error_messages
+        )
 
     @app_commands.command(name="unmutechannel", description="Unmute all users (except bots) in a specified voice channel")
     @app_commands.describe(channel="Select a voice channel to unmute users in")
@@ -62,38 +83,42 @@ class ChannelMuteCog(commands.Cog):
 
         unmuted_count = 0
         error_messages = []
-        # Filter for actually muted members, excluding the bot itself
-        members_to_unmute = [m for m in channel.members if m != interaction.guild.me and m.voice and m.voice.mute]
+        # Only muted members need unmuting, excluding the bot itself
+        members_to_unmute = await self._members_from_ids(interaction.guild, self.bot.voice_index.muted_in(interaction.guild.id, channel.id))
 
         if not members_to_unmute:
             await interaction.followup.send(f"No users need to be unmuted in {channel.mention}.", ephemeral=True)
             return
 
-        for member in members_to_unmute:
-            # Check if they're still in voice and muted
-            if member.voice and member.voice.mute:
-                try:
-                    await member.edit(mute=False, reason=f"Unmuted by {interaction.user} using /unmutechannel")
-                    unmuted_count += 1
-                    # Cancel any timed unmute task if it exists
-                    task_key = (member.guild.id, member.id)
-                    if task_key in self.bot.timed_mute_tasks:
-                        self.bot.timed_mute_tasks[task_key].cancel()
-                        del self.bot.timed_mute_tasks[task_key]
-                        print(f"Cancelled timed unmute task for {member.display_name} (manual unmute).")
-                except discord.Forbidden:
-                    error_messages.append(f"❌ No permission to unmute {member.display_name}")
-                except Exception as e:
-                    error_messages.append(f"⚠️ Error unmuting {member.display_name}: {type(e).__name__}")
-                    print(f"Error unmuting {member.display_name} ({member.id}): {e}")
-            else:
+        progress = BulkProgress(interaction, f"Unmuting users in {channel.mention}", len(members_to_unmute))
+        progress.start()
+        results = await self.bot.member_editor.bulk_edit_mute(
+            members_to_unmute, False, reason=f"Unmuted by {interaction.user} using /unmutechannel", on_result=progress.add
+        )
+        for member, status, error in results:
+            if status == "ok":
+                # Any timed unmute was cancelled by the member editor
+                self.bot.mod_log.record(member.guild.id, member.id, interaction.user.id, "unmute")
+                unmuted_count += 1
+            elif status == "forbidden":
+                error_messages.append(f"❌ No permission to unmute {member.display_name}")
+            elif status == "left":
                 error_messages.append(f"ℹ️ {member.display_name} has already left voice or been unmuted.")
-
-        response_message = f"✅ In {channel.mention}, attempted to unmute {len(members_to_unmute)} users, {unmuted_count} successful."
-        if error_messages:
-            response_message += "\n**Details:**\n" + "\n".join(error_messages)
-
-        await interaction.followup.send(response_message, ephemeral=True)
+            elif status == "superseded":
+                error_messages.append(f"🔁 {member.display_name} was muted by another command at the same time.")
+            elif isinstance(error, CircuitOpenError):
+                error_messages.append(f"⏸️ Skipped {member.display_name}: member edits are paused after repeated Discord errors.")
+            else:
+                error_messages.append(f"⚠️ Error unmuting {member.display_name}: {type(error).__name__}")
+                log.warning("Error unmuting %s: %s", member.display_name, error, extra={
+                    "command": "unmutechannel", "guild": member.guild.id, "member": member.id,
+                    "sample_key": ("unmutechannel", member.guild.id, type(error).__name__),
+                })
+
+        # Paginated, big channels can have more details than fit in one message
+        await progress.finish(
+            f"✅ In {channel.mention}, attempted to unmute {len(members_to_unmute)} users, {unmuted_count} successful.", error_messages
+        )
 
 async def setup(bot):
     await bot.add_cog(ChannelMuteCog(bot))
\ No newline at end of file
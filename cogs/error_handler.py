@@ -1,7 +1,11 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
-import traceback
+import logging
+import math
+from utils.resilience import CircuitOpenError
+
+log = logging.getLogger(__name__)
 
 class ErrorHandlerCog(commands.Cog):
     """Error handling module"""
@@ -10,6 +14,17 @@ class ErrorHandlerCog(commands.Cog):
         self.bot = bot
         bot.tree.error(self.on_app_command_error)
         
+    def _discord_error_message(self, interaction: discord.Interaction):
+        """Describe a failed Discord request by the guild's breaker state, the status code is only logged"""
+        breaker = self.bot.member_editor.breaker(interaction.guild_id) if interaction.guild_id else None
+        if breaker is None or breaker.failures == 0:
+            return "Network error: Issue communicating with Discord API. Please try again later."
+        if breaker.state == "closed":
+            return (f"⚠️ Discord is having trouble right now ({breaker.failures} failed requests in a row). "
+                    f"Please try again shortly.")
+        return (f"🔌 Discord keeps failing member edits in this server, so they are paused. "
+                f"Please try again in {math.ceil(breaker.retry_in()) or 1} seconds.")
+
     async def on_app_command_error(self, interaction: discord.Interaction, error: app_commands.AppCommandError):
         """Handle errors that occur during slash command execution"""
         error_message = "An unknown error occurred while executing the command."
@@ -24,12 +39,17 @@ class ErrorHandlerCog(commands.Cog):
             log_error = False
         elif isinstance(error, app_commands.errors.CommandInvokeError):
             original = error.original
-            print(f"Command '{interaction.command.name if interaction.command else 'Unknown'}' failed:")
-            traceback.print_exception(type(original), original, original.__traceback__)
+            command_name = interaction.command.name if interaction.command else 'Unknown'
+            log.error("Command '%s' failed", command_name, exc_info=original, extra={
+                "command": command_name, "guild": interaction.guild_id, "member": interaction.user.id,
+            })
             if isinstance(original, discord.Forbidden):
                 error_message = f"❌ Bot lacks required permissions. Please check bot role permissions."
+            elif isinstance(original, CircuitOpenError):
+                error_message = (f"🔌 Discord keeps failing member edits in this server, so they are paused. "
+                                 f"Please try again in {math.ceil(original.retry_in)} seconds.")
             elif isinstance(original, discord.HTTPException):
-                error_message = f"Network error: Issue communicating with Discord API ({original.status} - {original.code}). Please try again later."
+                error_message = self._discord_error_message(interaction)
             else:
                 error_message = f"⚙️ Internal error: {type(original).__name__}. Please check console logs."
         elif isinstance(error, app_commands.errors.CheckFailure):
@@ -47,7 +67,10 @@ class ErrorHandlerCog(commands.Cog):
             error_message = f"Error: {type(error).__name__}"
 
         if log_error:
-            print(f"Unhandled slash command error ({type(error).__name__}): {error}")
+            log.warning("Unhandled slash command error (%s): %s", type(error).__name__, error, extra={
+                "command": interaction.command.name if interaction.command else None,
+                "guild": interaction.guild_id, "member": interaction.user.id,
+            })
 
         try:
             if interaction.response.is_done():
@@ -58,9 +81,12 @@ class ErrorHandlerCog(commands.Cog):
             try:
                 await interaction.followup.send(error_message, ephemeral=True)
             except Exception as e_inner:
-                print(f"Failed to send error message (retry): {e_inner}")
+                log.warning("Failed to send error message (retry): %s", e_inner)
         except Exception as e:
-            print(f"Failed to send error message: {e}")
+            log.warning("Failed to send error message: %s", e)
+
+        # Failed commands count towards latency too, up to their error response
+        self.bot.record_command_latency(interaction)
 
 async def setup(bot):
     await bot.add_cog(ErrorHandlerCog(bot))
\ No newline at end of file
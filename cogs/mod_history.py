@@ -0,0 +1,40 @@
+import discord
+from discord.ext import commands
+from discord import app_commands
+from datetime import datetime, timezone
+from utils.time_parser import format_duration
+
+ACTION_LABELS = {"mute": "🔇 Muted", "unmute": "🔊 Unmuted", "expire": "⏰ Timed mute expired"}
+
+class ModHistoryCog(commands.Cog):
+    """Mute and unmute history from the moderation log"""
+
+    def __init__(self, bot):
+        self.bot = bot
+
+    @staticmethod
+    def _describe(event):
+        when = discord.utils.format_dt(datetime.fromtimestamp(event.timestamp, tz=timezone.utc), "f")
+        line = f"{when} {ACTION_LABELS[event.action_name]}"
+        if event.action_name != "expire":
+            line += f" by <@{event.actor_id}>"
+        if event.duration:
+            line += f" for {format_duration(event.duration)}"
+        return line
+
+    @app_commands.command(name="mutehistory", description="Show who muted or unmuted a user, and for how long")
+    @app_commands.describe(user="User to look up (may have left the server)", limit="Number of events to show (default 10)")
+    @app_commands.checks.has_permissions(mute_members=True)
+    async def mutehistory(self, interaction: discord.Interaction, user: discord.User, limit: app_commands.Range[int, 1, 20] = 10):
+        """Answer straight from the moderation log index, no deferral needed"""
+        events = self.bot.mod_log.history(interaction.guild_id, user.id, limit)
+        if not events:
+            await interaction.response.send_message(f"No mute history for {user.mention}.", ephemeral=True,
+                                                    allowed_mentions=discord.AllowedMentions.none())
+            return
+        lines = [f"📜 Latest {len(events)} moderation events for {user.mention}:"]
+        lines.extend(self._describe(event) for event in events)
+        await interaction.response.send_message("\n".join(lines), ephemeral=True, allowed_mentions=discord.AllowedMentions.none())
+
+async def setup(bot):
+    await bot.add_cog(ModHistoryCog(bot))
@@ -0,0 +1,130 @@
+import discord
+from discord.ext import commands
+from discord import app_commands
+import re
+from datetime import datetime, timezone
+
+# Channel mentions (<#id>) or bare IDs in the channels option
+CHANNEL_ID_PATTERN = re.compile(r"\d{15,20}")
+
+STATUS_ICONS = {"queued": "🕒", "running": "⏳", "done": "✅", "cancelled": "🛑", "failed": "⚠️"}
+
+class MuteJobsCog(commands.Cog):
+    """Guild-wide mute jobs that run in the background"""
+
+    jobs = app_commands.Group(name="jobs", description="List, inspect or cancel guild-wide mute jobs")
+
+    def __init__(self, bot):
+        self.bot = bot
+
+    @staticmethod
+    def _target_channels(guild: discord.Guild, category, channels):
+        """Voice channels from a category and/or a list of channel mentions, or the whole guild"""
+        if category is None and not channels:
+            return guild.voice_channels + guild.stage_channels
+
+        targets = []
+        if category is not None:
+            targets.extend(category.voice_channels + category.stage_channels)
+        for channel_id in CHANNEL_ID_PATTERN.findall(channels or ""):
+            channel = guild.get_channel(int(channel_id))
+            if isinstance(channel, (discord.VoiceChannel, discord.StageChannel)) and channel not in targets:
+                targets.append(channel)
+        return targets
+
+    @staticmethod
+    def _describe(job):
+        """One line summary of a job for /jobs"""
+        created = discord.utils.format_dt(datetime.fromtimestamp(job.created_at, tz=timezone.utc), "R")
+        return (
+            f"{STATUS_ICONS.get(job.status, '')} Job #{job.id}: {job.action} in {len(job.channel_ids)} channels, "
+            f"{job.status}, {job.processed}/{job.total} processed ({job.succeeded} successful, "
+            f"{job.skipped} skipped, {job.failed} failed), started {created} by <@{job.requested_by}>"
+        )
+
+    async def _submit(self, interaction: discord.Interaction, mute: bool, category, channels):
+        await interaction.response.defer(ephemeral=True, thinking=True)
+
+        targets = self._target_channels(interaction.guild, category, channels)
+        if not targets:
+            await interaction.followup.send("No voice channels found to act on.", ephemeral=True)
+            return
+
+        command = "muteall" if mute else "unmuteall"
+        job = self.bot.job_queue.submit(
+            interaction.guild.id, [channel.id for channel in targets], mute, interaction.user.id,
+            reason=f"{'Muted' if mute else 'Unmuted'} by {interaction.user} using /{command}",
+        )
+        await interaction.followup.send(
+            f"🗂️ Queued job #{job.id} to {job.action} users in {len(targets)} voice channels. "
+            f"Check on it with `/jobs status {job.id}` or stop it with `/jobs cancel {job.id}`.",
+            ephemeral=True,
+        )
+
+    @app_commands.command(name="muteall", description="Mute everyone in a category, a list of voice channels, or the whole server")
+    @app_commands.describe(
+        category="Category whose voice channels to mute",
+        channels="Voice channels to mute, as mentions or IDs (leave both empty for the whole server)"
+    )
+    @app_commands.checks.has_permissions(mute_members=True)
+    async def muteall(self, interaction: discord.Interaction, category: discord.CategoryChannel = None, channels: str = None):
+        """Queue a background job muting users across many voice channels"""
+        await self._submit(interaction, True, category, channels)
+
+    @app_commands.command(name="unmuteall", description="Unmute everyone in a category, a list of voice channels, or the whole server")
+    @app_commands.describe(
+        category="Category whose voice channels to unmute",
+        channels="Voice channels to unmute, as mentions or IDs (leave both empty for the whole server)"
+    )
+    @app_commands.checks.has_permissions(mute_members=True)
+    async def unmuteall(self, interaction: discord.Interaction, category: discord.CategoryChannel = None, channels: str = None):
+        """Queue a background job unmuting users across many voice channels"""
+        await self._submit(interaction, False, category, channels)
+
+    @jobs.command(name="list", description="Show this server's recent mute jobs")
+    @app_commands.checks.has_permissions(mute_members=True)
+    async def jobs_list(self, interaction: discord.Interaction):
+        """List recent jobs in this server"""
+        recent = self.bot.job_queue.recent(interaction.guild.id)
+        if not recent:
+            await interaction.response.send_message("No mute jobs have been run in this server.", ephemeral=True)
+            return
+
+        response_message = "🗂️ Recent mute jobs:"
+        for job in recent:
+            line = self._describe(job)
+            if len(response_message) + len(line) + 1 > 2000:
+                break
+            response_message += "\n" + line
+        await interaction.response.send_message(response_message, ephemeral=True, allowed_mentions=discord.AllowedMentions.none())
+
+    @jobs.command(name="status", description="Show the progress of a mute job")
+    @app_commands.describe(job_id="Job number")
+    @app_commands.checks.has_permissions(mute_members=True)
+    async def jobs_status(self, interaction: discord.Interaction, job_id: int):
+        """Show one job's progress"""
+        job = self.bot.job_queue.get(job_id)
+        if job is None or job.guild_id != interaction.guild.id:
+            await interaction.response.send_message(f"Job #{job_id} not found.", ephemeral=True)
+            return
+        await interaction.response.send_message(self._describe(job), ephemeral=True, allowed_mentions=discord.AllowedMentions.none())
+
+    @jobs.command(name="cancel", description="Stop a running mute job")
+    @app_commands.describe(job_id="Job number")
+    @app_commands.checks.has_permissions(mute_members=True)
+    async def jobs_cancel(self, interaction: discord.Interaction, job_id: int):
+        """Cancel a queued or running job"""
+        job = self.bot.job_queue.get(job_id)
+        if job is None or job.guild_id != interaction.guild.id:
+            await interaction.response.send_message(f"Job #{job_id} not found.", ephemeral=True)
+            return
+        if not self.bot.job_queue.cancel(job_id):
+            await interaction.response.send_message(f"Job #{job_id} is no longer running ({job.status}).", ephemeral=True)
+            return
+        await interaction.response.send_message(
+            f"🛑 Cancelled job #{job_id} after {job.processed}/{job.total} members. Members already edited keep their new state.",
+            ephemeral=True,
+        )
+
+async def setup(bot):
+    await bot.add_cog(MuteJobsCog(bot))
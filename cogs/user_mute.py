@@ -1,64 +1,112 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
-import asyncio
-import traceback
-from utils.time_parser import parse_duration
+import time
+import logging
+from utils.time_parser import parse_duration, format_duration, suggest_durations
+from utils.resilience import CircuitOpenError, backoff_delay, is_transient
+
+log = logging.getLogger(__name__)
+
+# Failed timed unmutes are retried this many times, backing off up to UNMUTE_RETRY_CAP seconds apart
+MAX_UNMUTE_ATTEMPTS = 12
+UNMUTE_RETRY_BASE = 5.0
+UNMUTE_RETRY_CAP = 300.0
 
 class UserMuteCog(commands.Cog):
     """User mute related commands"""
     
     def __init__(self, bot):
         self.bot = bot
-
-    async def unmute_after_delay(self, member: discord.Member, delay: float, interaction: discord.Interaction):
-        """Unmute member after a delay"""
-        await asyncio.sleep(delay)
-        
-        # Important: Re-fetch member as their state may have changed
-        # Check if the task is still relevant (e.g., not manually unmuted/cancelled)
-        task_key = (member.guild.id, member.id)
-        if task_key not in self.bot.timed_mute_tasks:
-            # Task might have been manually unmuted or cancelled by other commands
-            print(f"Timed unmute task for {member.display_name} ({member.id}) was cancelled or completed.")
+        # key: (guild_id, member_id), value: failed attempts of a requeued timed unmute
+        self._unmute_attempts = {}
+
+    async def cog_load(self):
+        self.bot.unmute_scheduler.set_handler(self.unmute_expired)
+
+    async def cog_unload(self):
+        # Pending unmutes stay scheduled and fire once the cog is loaded again
+        self.bot.unmute_scheduler.set_handler(None)
+
+    async def unmute_expired(self, keys):
+        """Unmute a batch of members whose timed mute has expired"""
+        # Member and voice state lookups need the guild cache
+        await self.bot.wait_until_ready()
+
+        members_to_unmute = []
+        for guild_id, member_id in keys:
+            guild = self.bot.get_guild(guild_id)
+            if not guild:
+                log.error("Could not find guild to timed unmute %s", member_id, extra={"guild": guild_id, "member": member_id})
+                continue
+
+            # Re-fetch member as their state may have changed since the mute
+            member = guild.get_member(member_id)
+            if member and member.voice and member.voice.mute:
+                members_to_unmute.append(member)
+            elif member and member.voice and not member.voice.mute:
+                log.info("%s was manually unmuted.", member.display_name, extra={"guild": guild_id, "member": member_id})
+            elif not member:
+                # In lean member cache mode, members outside voice aren't cached either
+                log.info("User %s left voice or the server before auto unmute.", member_id, extra={"guild": guild_id, "member": member_id})
+            else:
+                log.info("%s left voice channel before auto unmute.", member.display_name, extra={"guild": guild_id, "member": member_id})
+
+        results = await self.bot.member_editor.bulk_edit_mute(members_to_unmute, False, reason="Automatic temporary unmute")
+        for member, status, error in results:
+            context = {"guild": member.guild.id, "member": member.id}
+            key = (member.guild.id, member.id)
+            if status == "error" and (isinstance(error, CircuitOpenError) or is_transient(error)):
+                self._requeue_unmute(member, error)
+                continue
+            self._unmute_attempts.pop(key, None)
+            if status == "ok":
+                self.bot.mod_log.record(member.guild.id, member.id, self.bot.user.id, "expire")
+                log.info("Automatically unmuted %s.", member.display_name, extra=context)
+            elif status == "forbidden":
+                log.warning("Insufficient permissions to automatically unmute %s.", member.display_name, extra=context)
+            elif status == "left":
+                log.info("%s left voice channel before auto unmute.", member.display_name, extra=context)
+            elif status == "superseded":
+                log.info("%s was muted again before auto unmute.", member.display_name, extra=context)
+            elif isinstance(error, discord.HTTPException):
+                log.warning("Network error unmuting %s: %s", member.display_name, error, extra=context)
+            else:
+                log.error("Unknown error during auto unmute for %s", member.display_name, exc_info=error, extra=context)
+
+    def _requeue_unmute(self, member: discord.Member, error: Exception):
+        """Schedule another try at a timed unmute that failed on a Discord outage"""
+        key = (member.guild.id, member.id)
+        attempts = self._unmute_attempts.get(key, 0) + 1
+        context = {"guild": member.guild.id, "member": member.id}
+        if attempts > MAX_UNMUTE_ATTEMPTS:
+            self._unmute_attempts.pop(key, None)
+            log.error("Giving up on auto unmute for %s after %d attempts: %s", member.display_name, attempts - 1, error, extra=context)
             return
-            
-        # Try to get member from guild
-        guild = interaction.guild
-        if not guild:
-            print(f"Error: Could not find guild to timed unmute {member.id}")
-            del self.bot.timed_mute_tasks[task_key]
-            return
-            
-        fresh_member = guild.get_member(member.id)
-
-        if fresh_member and fresh_member.voice and fresh_member.voice.mute:
-            try:
-                await fresh_member.edit(mute=False, reason="Automatic temporary unmute")
-                print(f"Automatically unmuted {fresh_member.display_name} ({fresh_member.id}).")
-            except discord.Forbidden:
-                print(f"Insufficient permissions to automatically unmute {fresh_member.display_name} ({fresh_member.id}).")
-            except discord.HTTPException as e:
-                print(f"Network error unmuting {fresh_member.display_name} ({fresh_member.id}): {e}")
-            except Exception as e:
-                print(f"Unknown error during auto unmute for {fresh_member.display_name} ({fresh_member.id}): {e}")
-                traceback.print_exc()
-        elif fresh_member and fresh_member.voice and not fresh_member.voice.mute:
-            print(f"{fresh_member.display_name} ({fresh_member.id}) was manually unmuted.")
-        elif not fresh_member:
-            print(f"User {member.id} left the server before auto unmute.")
-        else:
-            print(f"{fresh_member.display_name} ({fresh_member.id}) left voice channel before auto unmute.")
-            
-        # Clean up task entry regardless of outcome
-        if task_key in self.bot.timed_mute_tasks:
-            del self.bot.timed_mute_tasks[task_key]
-
-    @app_commands.command(name="mute", description="Mute a user for a specified duration (e.g., 30s, 5m, 1h, 1d)")
+        self._unmute_attempts[key] = attempts
+        delay = backoff_delay(attempts, base=UNMUTE_RETRY_BASE, cap=UNMUTE_RETRY_CAP)
+        if isinstance(error, CircuitOpenError):
+            delay = max(delay, error.retry_in)
+        # A mute issued in the meantime owns the schedule now
+        if (member.guild.id, member.id) not in self.bot.unmute_scheduler:
+            self.bot.unmute_scheduler.schedule(member.guild.id, member.id, time.time() + delay)
+        log.warning("Auto unmute for %s failed (%s), retrying in %.0fs.", member.display_name, error, delay, extra=context)
+
+    async def duration_autocomplete(self, interaction: discord.Interaction, current: str):
+        """Suggest durations for what has been typed so far, cached so bursts of keystrokes stay cheap"""
+        max_seconds = int(self.bot.max_mute_duration.total_seconds())
+        choices = []
+        for value, seconds in suggest_durations(current, max_seconds):
+            readable = format_duration(seconds, None)
+            choices.append(app_commands.Choice(name=value if readable == value else f"{value} ({readable})", value=value))
+        return choices
+
+    @app_commands.command(name="mute", description="Mute a user for a specified duration (e.g., 30s, 5m, 1h30m, 2w)")
     @app_commands.describe(
         member="User to mute",
-        duration="Duration (format: number + unit s/m/h/d, e.g., 10m)"
+        duration="Duration (number + unit s/m/h/d/w, combinable, e.g., 10m or 1h30m)"
     )
+    @app_commands.autocomplete(duration=duration_autocomplete)
     @app_commands.checks.has_permissions(mute_members=True)
     async def mute_user(self, interaction: discord.Interaction, member: discord.Member, duration: str):
         """Mute a specific user for a set duration"""
@@ -82,45 +130,34 @@ class UserMuteCog(commands.Cog):
         # 4. Parse duration
         delta = parse_duration(duration)
         if delta is None:
-            await interaction.followup.send("Invalid duration format. Please use formats like `30s`, `5m`, `1h`, `1d`.", ephemeral=True)
+            await interaction.followup.send("Invalid duration format. Please use formats like `30s`, `5m`, `1h30m`, `2w`.", ephemeral=True)
+            return
+        if delta > self.bot.max_mute_duration:
+            limit = format_duration(self.bot.max_mute_duration.total_seconds(), None)
+            await interaction.followup.send(f"Duration can't be longer than `{limit}`.", ephemeral=True)
             return
-            
+
         total_seconds = delta.total_seconds()
         if total_seconds <= 0:
             await interaction.followup.send("Duration must be positive.", ephemeral=True)
             return
 
-        # 5. Execute mute and schedule unmute
-        task_key = (interaction.guild.id, member.id)
-        
-        # Cancel any existing timed unmute tasks for this user
-        if task_key in self.bot.timed_mute_tasks:
-            self.bot.timed_mute_tasks[task_key].cancel()
-            del self.bot.timed_mute_tasks[task_key]
-            print(f"Cancelled old timed unmute task for {member.display_name} (new mute command).")
-
+        # 5. Execute mute, the member editor schedules the unmute (replacing any older one) once it is applied
         try:
             reason = f"Muted by {interaction.user} using /mute for {duration}"
-            await member.edit(mute=True, reason=reason)
+            status = await self.bot.member_editor.edit_mute(member, True, reason=reason, deadline=time.time() + total_seconds)
 
-            # Schedule unmute task
-            unmute_task = asyncio.create_task(self.unmute_after_delay(member, total_seconds, interaction))
-            self.bot.timed_mute_tasks[task_key] = unmute_task
-
-            await interaction.followup.send(f"✅ Muted {member.mention} for {duration}.", ephemeral=True)
+            if status == "superseded":
+                await interaction.followup.send(f"🔁 {member.mention} was unmuted by another command at the same time.", ephemeral=True)
+            elif status == "left":
+                await interaction.followup.send(f"{member.mention} left the voice channel before being muted.", ephemeral=True)
+            else:
+                self.bot.mod_log.record(interaction.guild_id, member.id, interaction.user.id, "mute", total_seconds)
+                await interaction.followup.send(f"✅ Muted {member.mention} for {duration}.", ephemeral=True)
 
         except discord.Forbidden:
             await interaction.followup.send(f"❌ Insufficient permissions to mute {member.mention}.", ephemeral=True)
-        except discord.HTTPException as e:
-            await interaction.followup.send(f"Network error muting {member.mention}: {e}", ephemeral=True)
-        except Exception as e:
-            await interaction.followup.send(f"⚠️ Unknown error while muting {member.mention}.", ephemeral=True)
-            print(f"Error muting user {member.display_name} ({member.id}): {e}")
-            traceback.print_exc()
-            # Clean up task if mute failed but task might have been created
-            if task_key in self.bot.timed_mute_tasks:
-                self.bot.timed_mute_tasks[task_key].cancel()
-                del self.bot.timed_mute_tasks[task_key]
+        # Anything else (including an open circuit breaker) is reported by ErrorHandlerCog
 
     @app_commands.command(name="unmute", description="Immediately unmute a specific user")
     @app_commands.describe(member="User to unmute")
@@ -144,28 +181,22 @@ class UserMuteCog(commands.Cog):
             await interaction.followup.send(f"{member.mention} is not muted.", ephemeral=True)
             return
 
-        # 4. Execute unmute
-        task_key = (interaction.guild.id, member.id)
+        # 4. Execute unmute, the member editor cancels any timed unmute
         try:
             reason = f"Unmuted by {interaction.user} using /unmute"
-            await member.edit(mute=False, reason=reason)
-
-            # Cancel any timed unmute task if it exists
-            if task_key in self.bot.timed_mute_tasks:
-                self.bot.timed_mute_tasks[task_key].cancel()
-                del self.bot.timed_mute_tasks[task_key]
-                print(f"Cancelled timed unmute task for {member.display_name} (manual unmute).")
+            status = await self.bot.member_editor.edit_mute(member, False, reason=reason)
 
-            await interaction.followup.send(f"✅ Unmuted {member.mention}.", ephemeral=True)
+            if status == "superseded":
+                await interaction.followup.send(f"🔁 {member.mention} was muted by another command at the same time.", ephemeral=True)
+            elif status == "left":
+                await interaction.followup.send(f"{member.mention} has already left voice or been unmuted.", ephemeral=True)
+            else:
+                self.bot.mod_log.record(interaction.guild_id, member.id, interaction.user.id, "unmute")
+                await interaction.followup.send(f"✅ Unmuted {member.mention}.", ephemeral=True)
 
         except discord.Forbidden:
             await interaction.followup.send(f"❌ Insufficient permissions to unmute {member.mention}.", ephemeral=True)
-        except discord.HTTPException as e:
-            await interaction.followup.send(f"Network error unmuting {member.mention}: {e}", ephemeral=True)
-        except Exception as e:
-            await interaction.followup.send(f"⚠️ Unknown error while unmuting {member.mention}.", ephemeral=True)
-            print(f"Error unmuting user {member.display_name} ({member.id}): {e}")
-            traceback.print_exc()
+        # Anything else (including an open circuit breaker) is reported by ErrorHandlerCog
 
 async def setup(bot):
     await bot.add_cog(UserMuteCog(bot))
\ No newline at end of file
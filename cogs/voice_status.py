@@ -0,0 +1,79 @@
+import discord
+from discord.ext import commands
+from discord import app_commands
+from datetime import datetime, timezone
+
+class VoiceStatusCog(commands.Cog):
+    """Keeps the voice state index current and reports mute status"""
+
+    def __init__(self, bot):
+        self.bot = bot
+
+    async def cog_load(self):
+        # Voice state events may have been missed while the cog was unloaded
+        if self.bot.is_ready():
+            for guild in self.bot.guilds:
+                self.bot.voice_index.rebuild_guild(guild)
+
+    @commands.Cog.listener()
+    async def on_guild_available(self, guild: discord.Guild):
+        self.bot.voice_index.rebuild_guild(guild)
+
+    @commands.Cog.listener()
+    async def on_guild_join(self, guild: discord.Guild):
+        self.bot.voice_index.rebuild_guild(guild)
+
+    @commands.Cog.listener()
+    async def on_guild_unavailable(self, guild: discord.Guild):
+        self.bot.voice_index.remove_guild(guild.id)
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild: discord.Guild):
+        self.bot.voice_index.remove_guild(guild.id)
+
+    @commands.Cog.listener()
+    async def on_voice_state_update(self, member: discord.Member, before: discord.VoiceState, after: discord.VoiceState):
+        channel_id = after.channel.id if after.channel else None
+        self.bot.voice_index.update(member.guild.id, member.id, channel_id, after.mute)
+
+    @app_commands.command(name="mutestatus", description="Show who is muted in voice channels and pending timed unmutes")
+    @app_commands.describe(channel="Voice channel to inspect (defaults to every occupied channel)")
+    @app_commands.checks.has_permissions(mute_members=True)
+    async def mutestatus(self, interaction: discord.Interaction, channel: discord.VoiceChannel = None):
+        """Report mute status from the voice state index"""
+        index = self.bot.voice_index
+        guild = interaction.guild
+
+        if channel is not None:
+            muted = index.muted_in(guild.id, channel.id)
+            unmuted = index.unmuted_in(guild.id, channel.id)
+            pending = index.pending_in(guild.id, channel.id)
+            response_message = (
+                f"🔇 {channel.mention}: {len(muted)} muted, {len(unmuted)} unmuted, "
+                f"{len(pending)} with a pending timed unmute."
+            )
+            lines = []
+            for member_id in sorted(pending, key=lambda member_id: self.bot.unmute_scheduler.deadline(guild.id, member_id)):
+                deadline = self.bot.unmute_scheduler.deadline(guild.id, member_id)
+                lines.append(f"<@{member_id}> unmutes {discord.utils.format_dt(datetime.fromtimestamp(deadline, tz=timezone.utc), 'R')}")
+        else:
+            lines = []
+            for channel_id, (muted, unmuted) in index.channels(guild.id).items():
+                pending = index.pending_in(guild.id, channel_id)
+                lines.append(f"<#{channel_id}>: {len(muted)} muted, {len(unmuted)} unmuted, {len(pending)} pending")
+            if not lines:
+                await interaction.response.send_message("No one is in a voice channel.", ephemeral=True)
+                return
+            response_message = f"🔇 Mute status for {len(lines)} occupied voice channels:"
+
+        # Keep the reply within Discord's message length limit
+        for i, line in enumerate(lines):
+            if len(response_message) + len(line) + 40 > 2000:
+                response_message += f"\n...and {len(lines) - i} more."
+                break
+            response_message += "\n" + line
+
+        await interaction.response.send_message(response_message, ephemeral=True, allowed_mentions=discord.AllowedMentions.none())
+
+async def setup(bot):
+    await bot.add_cog(VoiceStatusCog(bot))
@@ -0,0 +1,108 @@
+import asyncio
+import contextlib
+import logging
+import os
+import signal
+import time
+
+log = logging.getLogger(__name__)
+
+# Crashed workers restart after this many seconds, doubling while they keep crashing
+RESTART_DELAY = 5.0
+MAX_RESTART_DELAY = 300.0
+# A worker that ran at least this long before crashing restarts after RESTART_DELAY again
+STABLE_RUNTIME = 60.0
+
+
+def shard_ranges(shard_count: int, workers: int):
+    """Split shard IDs 0..shard_count-1 into contiguous ranges, one per worker"""
+    workers = max(1, min(workers, shard_count))
+    base, extra = divmod(shard_count, workers)
+    ranges = []
+    start = 0
+    for worker_id in range(workers):
+        size = base + (1 if worker_id < extra else 0)
+        ranges.append(list(range(start, start + size)))
+        start += size
+    return ranges
+
+
+def worker_env(worker_id: int, shard_ids, shard_count: int):
+    """Environment telling a worker process which shards it runs"""
+    # Set rather than removed: the worker loads .env too, which would otherwise turn it into another supervisor
+    return dict(os.environ, WORKER_ID=str(worker_id), SHARD_IDS=",".join(map(str, shard_ids)), SHARD_COUNT=str(shard_count),
+                CLUSTER_WORKERS="1")
+
+
+async def run_cluster(command, workers: int, shard_count: int, restart: bool = True):
+    """Run command as worker processes that each own a range of shards
+
+    Workers read their shards from WORKER_ID, SHARD_IDS and SHARD_COUNT. One
+    that exits with an error is restarted with backoff (unless restart is
+    False). SIGINT and SIGTERM stop every worker. Returns the workers' exit
+    codes once all of them have exited.
+    """
+    processes = {}
+    stopping = False
+
+    async def supervise(worker_id, shard_ids):
+        delay = RESTART_DELAY
+        while True:
+            started = time.monotonic()
+            process = await asyncio.create_subprocess_exec(*command, env=worker_env(worker_id, shard_ids, shard_count))
+            processes[worker_id] = process
+            log.info("Started worker %d (pid %d) for shards %s.", worker_id, process.pid, shard_ids)
+            code = await process.wait()
+            if code == 0 or stopping or not restart:
+                return code
+            if time.monotonic() - started >= STABLE_RUNTIME:
+                delay = RESTART_DELAY
+            log.error("Worker %d exited with code %d, restarting in %.0fs.", worker_id, code, delay)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_RESTART_DELAY)
+
+    def stop():
+        nonlocal stopping
+        stopping = True
+        for process in processes.values():
+            if process.returncode is None:
+                process.terminate()
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        with contextlib.suppress(NotImplementedError):
+            loop.add_signal_handler(sig, stop)
+    try:
+        return await asyncio.gather(*(supervise(worker_id, shard_ids)
+                                      for worker_id, shard_ids in enumerate(shard_ranges(shard_count, workers))))
+    finally:
+        stop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            with contextlib.suppress(NotImplementedError):
+                loop.remove_signal_handler(sig)
+
+
+async def run_until_signalled(bot, token: str):
+    """Run bot until it closes, closing it cleanly on SIGINT or SIGTERM
+
+    Client.run only handles KeyboardInterrupt, so a worker stopped by its
+    supervisor would otherwise exit without flushing or closing its stores.
+    """
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        with contextlib.suppress(NotImplementedError):
+            loop.add_signal_handler(sig, stop.set)
+    runner = asyncio.create_task(bot.start(token))
+    stopper = asyncio.create_task(stop.wait())
+    try:
+        await asyncio.wait((runner, stopper), return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        stopper.cancel()
+        if not bot.is_closed():
+            await bot.close()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            with contextlib.suppress(NotImplementedError):
+                loop.remove_signal_handler(sig)
+    # Raises the bot's startup error, if any
+    await runner
@@ -0,0 +1,53 @@
+import hashlib
+import json
+import os
+
+DEFAULT_CACHE_PATH = os.path.join("data", "command_sync.json")
+
+
+def command_fingerprint(tree, guild=None) -> str:
+    """Return a stable hash of the payload tree.sync(guild=guild) would upload"""
+    payload = [command.to_dict(tree) for command in tree.get_commands(guild=guild)]
+    payload.sort(key=lambda command: (command.get("type", 1), command["name"]))
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class CommandSyncCache:
+    """On-disk record of the last synced command fingerprint per sync target"""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH):
+        self.path = path
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self._fingerprints = json.load(f)
+        except (OSError, ValueError):
+            self._fingerprints = {}
+
+    def is_current(self, target: str, fingerprint: str) -> bool:
+        return self._fingerprints.get(target) == fingerprint
+
+    def update(self, target: str, fingerprint: str):
+        self._fingerprints[target] = fingerprint
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Write to a temporary file first so a crash never leaves a truncated cache
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._fingerprints, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+
+async def sync_if_changed(tree, cache: CommandSyncCache, guild=None, force: bool = False):
+    """Sync the command tree only if its payload changed since the last sync
+
+    Returns the synced commands, or None if the sync was skipped.
+    """
+    target = f"{tree.client.application_id}:{f'guild:{guild.id}' if guild else 'global'}"
+    fingerprint = command_fingerprint(tree, guild=guild)
+    if not force and cache.is_current(target, fingerprint):
+        return None
+    synced = await tree.sync(guild=guild)
+    cache.update(target, fingerprint)
+    return synced
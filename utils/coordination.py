@@ -0,0 +1,87 @@
+import importlib
+
+
+def shard_for(guild_id: int, shard_count: int) -> int:
+    """The shard Discord delivers a guild's events to"""
+    return (guild_id >> 22) % shard_count
+
+
+class CoordinationBackend:
+    """Timed-mute state shared by every worker process of a cluster
+
+    Rows are (guild_id, member_id, deadline) with deadline as a time.time()
+    timestamp. Any backend all workers can reach works, e.g. a database
+    server; MuteStore is the SQLite implementation, fine for workers on one
+    host sharing a file. Custom backends subclass this and are picked with
+    COORDINATION_BACKEND=module:Class.
+    """
+
+    def add(self, guild_id: int, member_id: int, deadline: float):
+        raise NotImplementedError
+
+    def add_many(self, records):
+        raise NotImplementedError
+
+    def remove(self, guild_id: int, member_id: int):
+        raise NotImplementedError
+
+    def remove_many(self, keys):
+        raise NotImplementedError
+
+    def load_all(self):
+        raise NotImplementedError
+
+    def load_shards(self, shard_ids, shard_count: int):
+        """Return the rows for guilds on the given shards"""
+        shard_ids = set(shard_ids)
+        return [row for row in self.load_all() if shard_for(row[0], shard_count) in shard_ids]
+
+    def close(self):
+        pass
+
+
+class ShardView:
+    """A worker's share of a coordination backend
+
+    Writes go straight to the backend, loads only return guilds on the
+    worker's shards, so each timed unmute is restored by (and only by) the
+    process that receives that guild's events. Has the same interface as
+    MuteStore, so the unmute scheduler uses either.
+    """
+
+    def __init__(self, backend: CoordinationBackend, shard_ids, shard_count: int):
+        self.backend = backend
+        self.shard_ids = list(shard_ids)
+        self.shard_count = shard_count
+
+    def owns(self, guild_id: int) -> bool:
+        return shard_for(guild_id, self.shard_count) in self.shard_ids
+
+    def add(self, guild_id: int, member_id: int, deadline: float):
+        self.backend.add(guild_id, member_id, deadline)
+
+    def add_many(self, records):
+        self.backend.add_many(records)
+
+    def remove(self, guild_id: int, member_id: int):
+        self.backend.remove(guild_id, member_id)
+
+    def remove_many(self, keys):
+        self.backend.remove_many(keys)
+
+    def load_all(self):
+        return self.backend.load_shards(self.shard_ids, self.shard_count)
+
+    def close(self):
+        self.backend.close()
+
+
+def open_backend(spec: str, path: str) -> CoordinationBackend:
+    """Open the backend named by COORDINATION_BACKEND, sqlite (the file at path) or module:Class"""
+    if not spec or spec == "sqlite":
+        from utils.mute_store import MuteStore
+        return MuteStore(path)
+    module_name, _, class_name = spec.partition(":")
+    if not class_name:
+        raise ValueError(f"COORDINATION_BACKEND must be 'sqlite' or 'module:Class', got '{spec}'")
+    return getattr(importlib.import_module(module_name), class_name)()
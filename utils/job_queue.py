@@ -0,0 +1,196 @@
+import asyncio
+import logging
+
+from utils.members import resolve_members
+from utils.resilience import CircuitOpenError
+
+log = logging.getLogger(__name__)
+
+DEFAULT_JOB_CONCURRENCY = 5
+# Processed members are written to the job store in batches of this size
+CHECKPOINT_BATCH = 50
+
+
+class MuteJob:
+    """A guild-wide mute or unmute over a set of voice channels
+
+    Counters are live while the job runs; the job store holds the last
+    checkpointed copy.
+    """
+
+    def __init__(self, job_id, guild_id, channel_ids, mute, requested_by, reason, status="queued",
+                 total=0, succeeded=0, skipped=0, failed=0, created_at=None, finished_at=None):
+        self.id = job_id
+        self.guild_id = guild_id
+        self.channel_ids = channel_ids
+        self.mute = mute
+        self.requested_by = requested_by
+        self.reason = reason
+        self.status = status
+        self.total = total
+        self.succeeded = succeeded
+        self.skipped = skipped
+        self.failed = failed
+        self.created_at = created_at
+        self.finished_at = finished_at
+        self.task = None
+        # Member IDs processed since the last checkpoint
+        self.unsaved = []
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(*row)
+
+    @property
+    def action(self):
+        return "mute" if self.mute else "unmute"
+
+    @property
+    def processed(self):
+        return self.succeeded + self.skipped + self.failed
+
+
+class JobQueue:
+    """Runs mute jobs in the background, resuming unfinished ones after a restart
+
+    Jobs don't hold on to the interaction that created them. Every job's member
+    edits draw from one global concurrency budget, on top of MemberEditor's
+    per-guild limit, so a guild-wide job can't crowd out other guilds or the
+    interactive commands. Progress is checkpointed to the job store, and a
+    resumed job skips members it already processed.
+    """
+
+    def __init__(self, bot, store, concurrency: int = DEFAULT_JOB_CONCURRENCY):
+        self.bot = bot
+        self.store = store
+        self._budget = asyncio.Semaphore(max(1, concurrency))
+        # key: job ID, value: MuteJob, for jobs running in this process
+        self._jobs = {}
+
+    def __len__(self):
+        return len(self._jobs)
+
+    def submit(self, guild_id: int, channel_ids, mute: bool, requested_by: int, reason: str) -> MuteJob:
+        """Record and start a new job"""
+        job = MuteJob.from_row(self.store.create(guild_id, channel_ids, mute, requested_by, reason))
+        self._start(job)
+        return job
+
+    def resume(self):
+        """Restart every job that was queued or running when the bot last stopped, returns the count
+
+        In a cluster the job store is shared and each worker resumes only the
+        jobs of guilds on its own shards.
+        """
+        rows = [row for row in self.store.load_unfinished() if self.bot.owns_guild(row[1])]
+        for row in rows:
+            self._start(MuteJob.from_row(row))
+        return len(rows)
+
+    def get(self, job_id: int):
+        """Return a job, live if it is running here, or None"""
+        job = self._jobs.get(job_id)
+        if job is None:
+            row = self.store.get(job_id)
+            job = MuteJob.from_row(row) if row else None
+        return job
+
+    def recent(self, guild_id: int, limit: int = 10):
+        """Return a guild's most recent jobs, newest first"""
+        return [self._jobs.get(row[0]) or MuteJob.from_row(row) for row in self.store.recent(guild_id, limit)]
+
+    def cancel(self, job_id: int) -> bool:
+        """Stop a running job, members already edited stay edited"""
+        job = self._jobs.get(job_id)
+        if job is None:
+            return False
+        job.status = "cancelled"
+        job.task.cancel()
+        return True
+
+    async def stop(self):
+        """Stop every job without finishing it, so they resume on the next start"""
+        tasks = [job.task for job in self._jobs.values()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _start(self, job: MuteJob):
+        self._jobs[job.id] = job
+        job.task = asyncio.create_task(self._run(job))
+
+    def _checkpoint(self, job: MuteJob):
+        self.store.checkpoint(job.id, job.unsaved, job.total, job.succeeded, job.skipped, job.failed)
+        job.unsaved = []
+
+    def _finish(self, job: MuteJob, status: str):
+        self._checkpoint(job)
+        job.status = status
+        self.store.set_status(job.id, status)
+        log.info("Job #%d (%s) %s: %d successful, %d skipped, %d failed of %d.", job.id, job.action, status,
+                 job.succeeded, job.skipped, job.failed, job.total, extra={"guild": job.guild_id})
+
+    async def _run(self, job: MuteJob):
+        try:
+            # Member lookups need the guild cache and voice state index
+            await self.bot.wait_until_ready()
+            guild = self.bot.get_guild(job.guild_id)
+            if guild is None:
+                log.error("Could not find guild for job #%d", job.id, extra={"guild": job.guild_id})
+                self._finish(job, "failed")
+                return
+
+            job.status = "running"
+            self.store.set_status(job.id, "running")
+            done = self.store.done_members(job.id)
+            targets = []
+            for channel_id in job.channel_ids:
+                if job.mute:
+                    member_ids = self.bot.voice_index.unmuted_in(guild.id, channel_id)
+                else:
+                    member_ids = self.bot.voice_index.muted_in(guild.id, channel_id)
+                targets.extend(member_id for member_id in member_ids if member_id not in done and member_id != guild.me.id)
+            members = await resolve_members(guild, targets)
+            job.total = len(done) + len(members)
+            log.info("Job #%d (%s) started: %d members in %d channels, %d already done.", job.id, job.action,
+                     len(members), len(job.channel_ids), len(done), extra={"guild": guild.id})
+
+            await asyncio.gather(*(self._edit(job, member) for member in members))
+            self._finish(job, "done")
+        except asyncio.CancelledError:
+            if job.status == "cancelled":
+                self._finish(job, "cancelled")
+            else:
+                # Shutting down, keep the job's status so it resumes on the next start
+                self._checkpoint(job)
+            raise
+        except Exception:
+            log.exception("Job #%d failed", job.id, extra={"guild": job.guild_id})
+            self._finish(job, "failed")
+        finally:
+            self._jobs.pop(job.id, None)
+
+    async def _edit(self, job: MuteJob, member):
+        while True:
+            async with self._budget:
+                result = await self.bot.member_editor.edit_one(member, job.mute, job.reason)
+            if not isinstance(result.error, CircuitOpenError):
+                break
+            # Jobs aren't waited on by anyone, so they sit out an outage instead of failing every member
+            await asyncio.sleep(min(result.error.retry_in, 5.0))
+
+        if result.status == "ok":
+            self.bot.mod_log.record(job.guild_id, member.id, job.requested_by, job.action)
+            job.succeeded += 1
+        elif result.status in ("left", "superseded"):
+            job.skipped += 1
+        else:
+            job.failed += 1
+            log.warning("Error in job #%d for %s: %s", job.id, member.display_name, result.error, extra={
+                "guild": member.guild.id, "member": member.id,
+                "sample_key": ("job", job.id, type(result.error).__name__),
+            })
+
+        job.unsaved.append(member.id)
+        if len(job.unsaved) >= CHECKPOINT_BATCH:
+            self._checkpoint(job)
@@ -0,0 +1,124 @@
+import json
+import os
+import sqlite3
+import time
+
+DEFAULT_JOB_STORE_PATH = os.path.join("data", "mute_jobs.db")
+
+# Statuses of jobs that still have work to do and are resumed at startup
+UNFINISHED_STATUSES = ("queued", "running")
+
+_COLUMNS = ("id, guild_id, channel_ids, mute, requested_by, reason, status,"
+            " total, succeeded, skipped, failed, created_at, finished_at")
+
+
+class JobStore:
+    """SQLite-backed record of guild-wide mute jobs and their progress
+
+    Each job row carries its target channels, status and outcome counters, and
+    job_done holds the members a job has already processed, so a resumed job
+    can skip them. Uses the same WAL/synchronous=NORMAL setup as MuteStore.
+    """
+
+    def __init__(self, path: str = DEFAULT_JOB_STORE_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " guild_id INTEGER NOT NULL,"
+            " channel_ids TEXT NOT NULL,"
+            " mute INTEGER NOT NULL,"
+            " requested_by INTEGER NOT NULL,"
+            " reason TEXT NOT NULL,"
+            " status TEXT NOT NULL,"
+            " total INTEGER NOT NULL DEFAULT 0,"
+            " succeeded INTEGER NOT NULL DEFAULT 0,"
+            " skipped INTEGER NOT NULL DEFAULT 0,"
+            " failed INTEGER NOT NULL DEFAULT 0,"
+            " created_at REAL NOT NULL,"
+            " finished_at REAL"
+            ")"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_guild ON jobs (guild_id, id)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS job_done ("
+            " job_id INTEGER NOT NULL,"
+            " member_id INTEGER NOT NULL,"
+            " PRIMARY KEY (job_id, member_id)"
+            ") WITHOUT ROWID"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def _row(row):
+        row = list(row)
+        row[2] = json.loads(row[2])
+        row[3] = bool(row[3])
+        return tuple(row)
+
+    def create(self, guild_id: int, channel_ids, mute: bool, requested_by: int, reason: str):
+        """Record a new queued job, returns its row"""
+        created_at = time.time()
+        with self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO jobs (guild_id, channel_ids, mute, requested_by, reason, status, created_at)"
+                " VALUES (?, ?, ?, ?, ?, 'queued', ?)",
+                (guild_id, json.dumps(list(channel_ids)), int(mute), requested_by, reason, created_at),
+            )
+        return self.get(cursor.lastrowid)
+
+    def get(self, job_id: int):
+        """Return a job's row, or None"""
+        row = self._conn.execute(f"SELECT {_COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row(row) if row else None
+
+    def recent(self, guild_id: int, limit: int = 10):
+        """Return a guild's most recent job rows, newest first"""
+        rows = self._conn.execute(
+            f"SELECT {_COLUMNS} FROM jobs WHERE guild_id = ? ORDER BY id DESC LIMIT ?", (guild_id, limit)
+        ).fetchall()
+        return [self._row(row) for row in rows]
+
+    def load_unfinished(self):
+        """Return the rows of every job that was queued or running, oldest first"""
+        placeholders = ", ".join("?" * len(UNFINISHED_STATUSES))
+        rows = self._conn.execute(
+            f"SELECT {_COLUMNS} FROM jobs WHERE status IN ({placeholders}) ORDER BY id", UNFINISHED_STATUSES
+        ).fetchall()
+        return [self._row(row) for row in rows]
+
+    def done_members(self, job_id: int):
+        """Return the set of member IDs a job has already processed"""
+        return {member_id for (member_id,) in
+                self._conn.execute("SELECT member_id FROM job_done WHERE job_id = ?", (job_id,))}
+
+    def checkpoint(self, job_id: int, member_ids, total: int, succeeded: int, skipped: int, failed: int):
+        """Mark members as processed and save the job's counters in one transaction"""
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO job_done (job_id, member_id) VALUES (?, ?)",
+                [(job_id, member_id) for member_id in member_ids],
+            )
+            self._conn.execute(
+                "UPDATE jobs SET total = ?, succeeded = ?, skipped = ?, failed = ? WHERE id = ?",
+                (total, succeeded, skipped, failed, job_id),
+            )
+
+    def set_status(self, job_id: int, status: str):
+        """Update a job's status; finished jobs drop their per-member checkpoint"""
+        with self._conn:
+            if status in UNFINISHED_STATUSES:
+                self._conn.execute("UPDATE jobs SET status = ? WHERE id = ?", (status, job_id))
+            else:
+                self._conn.execute("UPDATE jobs SET status = ?, finished_at = ? WHERE id = ?",
+                                   (status, time.time(), job_id))
+                self._conn.execute("DELETE FROM job_done WHERE job_id = ?", (job_id,))
+
+    def close(self):
+        self._conn.close()
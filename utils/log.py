@@ -0,0 +1,123 @@
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import time
+
+# Extra fields copied into every structured record when present
+CONTEXT_FIELDS = ("guild", "member", "channel", "command", "latency_ms", "suppressed", "extension", "import_ms", "setup_ms")
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as one JSON object per line"""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for field in CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable format with the context fields appended"""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-8s %(name)s: %(message)s")
+
+    def format(self, record):
+        line = super().format(record)
+        context = " ".join(f"{field}={getattr(record, field)}" for field in CONTEXT_FIELDS
+                           if getattr(record, field, None) is not None)
+        return f"{line} [{context}]" if context else line
+
+
+class SamplingFilter(logging.Filter):
+    """Lets through at most burst records per sample_key per window seconds
+
+    Only records logged with extra={"sample_key": ...} are sampled, which is
+    meant for errors repeated once per member in bulk commands. The first record
+    after a window with drops carries the number suppressed.
+    """
+
+    def __init__(self, burst=5, window=10.0):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        # key: sample_key, value: [window start, records seen, records suppressed]
+        self._windows = {}
+
+    def filter(self, record):
+        key = getattr(record, "sample_key", None)
+        if key is None:
+            return True
+        now = record.created
+        state = self._windows.get(key)
+        if state is None or now - state[0] >= self.window:
+            suppressed = state[2] if state else 0
+            self._windows[key] = [now, 1, 0]
+            if suppressed:
+                record.suppressed = suppressed
+            # Forget stale keys so the table doesn't grow without bound
+            if len(self._windows) > 10000:
+                self._windows = {k: v for k, v in self._windows.items() if now - v[0] < self.window}
+            return True
+        state[1] += 1
+        if state[1] <= self.burst:
+            return True
+        state[2] += 1
+        return False
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # Resolve the message and traceback here, the background thread formats the rest
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def setup_logging(level="INFO", fmt="json", stream=None, sample_burst=5, sample_window=10.0):
+    """Route all logging through a queue to a background writer thread
+
+    Logging calls on the event loop only enqueue the record, so a slow stdout
+    (e.g. a backed-up log shipper) can't stall the loop or gateway heartbeats.
+    Returns the started QueueListener; call stop() on it to flush at exit.
+    """
+    writer = logging.StreamHandler(stream or sys.stdout)
+    writer.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+
+    records = queue.SimpleQueue()
+    handler = _QueueHandler(records)
+    # Loggers may be set below LOG_LEVEL for metrics (see RateLimitLogHandler), the output still follows it
+    handler.setLevel(level)
+    handler.addFilter(SamplingFilter(sample_burst, sample_window))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+
+    listener = logging.handlers.QueueListener(records, writer, respect_handler_level=False)
+    listener.start()
+    return listener
+
+
+def elapsed_ms(started_at: float) -> float:
+    """Milliseconds since a time.perf_counter() timestamp, for the latency_ms field"""
+    return round((time.perf_counter() - started_at) * 1000, 2)
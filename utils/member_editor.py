@@ -0,0 +1,260 @@
+import asyncio
+import logging
+import time
+from collections import namedtuple
+
+import discord
+
+from utils.resilience import CircuitBreaker, CircuitOpenError, backoff_delay, is_transient, DEFAULT_FAILURE_THRESHOLD, DEFAULT_COOLDOWN
+
+log = logging.getLogger(__name__)
+
+# Outcome of a single member edit. status is one of "ok", "forbidden", "left",
+# "superseded" (a later request for the same member won) or "error".
+MemberEditResult = namedtuple("MemberEditResult", ["member", "status", "error"])
+
+DEFAULT_CONCURRENCY = 5
+MAX_RETRIES = 3
+# Seconds a state this editor set is trusted over the member's cached voice state,
+# whose gateway update can arrive after the edit's response
+APPLIED_GRACE = 2.0
+
+
+def _retry_after(error: discord.HTTPException) -> float:
+    """Read the Retry-After header of a 429 response, in seconds"""
+    try:
+        return float(error.response.headers.get("Retry-After", 1.0))
+    except (AttributeError, TypeError, ValueError):
+        return 1.0
+
+
+class _MemberSlot:
+    """Requests for one member that arrived while an edit for them was in progress"""
+
+    __slots__ = ("mute", "reason", "deadline", "clear_timer", "waiters")
+
+    def __init__(self):
+        self.mute = None
+        self.reason = None
+        # Timed unmute to schedule, or whether an unmute among the requests cleared it
+        self.deadline = None
+        self.clear_timer = False
+        # (future, requested mute) per caller waiting on the next edit
+        self.waiters = []
+
+
+class MemberEditor:
+    """Shared engine for editing members' voice state with bounded concurrency
+
+    Member edits hit the PATCH /guilds/{guild_id}/members/{user_id} route, whose
+    rate-limit bucket is keyed on the guild. Each guild therefore gets its own
+    semaphore, so every command editing members in that guild shares one budget
+    instead of bursting into the same bucket from several places at once, and
+    its own circuit breaker, so an outage there sheds edits quickly.
+
+    Edits are also coordinated per (guild, member): while one is in flight,
+    further requests for that member are queued and collapsed to the latest
+    requested state, older conflicting requests resolve as "superseded", and
+    edits that wouldn't change anything are skipped. Timed unmutes follow the
+    state actually applied, so commands don't touch the scheduler themselves.
+    """
+
+    def __init__(self, concurrency: int = DEFAULT_CONCURRENCY, metrics=None, scheduler=None,
+                 failure_threshold: int = DEFAULT_FAILURE_THRESHOLD, breaker_cooldown: float = DEFAULT_COOLDOWN):
+        self.concurrency = max(1, concurrency)
+        self.metrics = metrics
+        self.scheduler = scheduler
+        self.failure_threshold = failure_threshold
+        self.breaker_cooldown = breaker_cooldown
+        # key: guild_id, value: asyncio.Semaphore
+        self._guild_limits = {}
+        # key: guild_id, value: CircuitBreaker
+        self._breakers = {}
+        # key: (guild_id, member_id), value: _MemberSlot while an edit for that member is in progress
+        self._slots = {}
+        self._drains = set()
+        # key: (guild_id, member_id), value: (mute, time.monotonic()) of the last edit sent
+        self._applied = {}
+
+    def _limit_for(self, guild_id: int) -> asyncio.Semaphore:
+        limit = self._guild_limits.get(guild_id)
+        if limit is None:
+            limit = asyncio.Semaphore(self.concurrency)
+            self._guild_limits[guild_id] = limit
+        return limit
+
+    def breaker(self, guild_id: int):
+        """Return a guild's circuit breaker, or None if it never had an edit"""
+        return self._breakers.get(guild_id)
+
+    def _breaker_for(self, guild_id: int) -> CircuitBreaker:
+        breaker = self._breakers.get(guild_id)
+        if breaker is None:
+            breaker = CircuitBreaker(self.failure_threshold, self.breaker_cooldown)
+            self._breakers[guild_id] = breaker
+        return breaker
+
+    def open_breakers(self) -> int:
+        """Number of guilds whose member edits are currently shed"""
+        return sum(breaker.state != "closed" for breaker in self._breakers.values())
+
+    async def _send(self, member: discord.Member, mute: bool, reason: str):
+        """Set a member's server mute, retrying what escapes discord.py's own retries
+
+        429s wait out Retry-After; 5xx responses and network errors back off
+        exponentially with jitter and count towards the guild's circuit breaker.
+        While it is open, edits fail fast with CircuitOpenError.
+        """
+        breaker = self._breaker_for(member.guild.id)
+        async with self._limit_for(member.guild.id):
+            for attempt in range(MAX_RETRIES + 1):
+                try:
+                    trial = breaker.before_call()
+                except CircuitOpenError:
+                    if self.metrics:
+                        self.metrics.member_edits.inc("circuit_open")
+                    raise
+                try:
+                    await member.edit(mute=mute, reason=reason)
+                except Exception as e:
+                    rate_limited = isinstance(e, discord.HTTPException) and e.status == 429
+                    if not is_transient(e):
+                        # Discord is up, it refused this request
+                        breaker.record_success()
+                    elif not rate_limited:
+                        breaker.record_failure()
+                    if not is_transient(e) or attempt == MAX_RETRIES:
+                        if self.metrics:
+                            self.metrics.record_edit(e)
+                        raise
+                    if rate_limited:
+                        delay = _retry_after(e)
+                        if self.metrics:
+                            self.metrics.rate_limit_waits.inc()
+                            self.metrics.rate_limit_wait_seconds.inc(amount=delay)
+                    else:
+                        delay = backoff_delay(attempt)
+                        if self.metrics:
+                            self.metrics.edit_retries.inc()
+                else:
+                    breaker.record_success()
+                    if self.metrics:
+                        self.metrics.record_edit()
+                    return
+                finally:
+                    # A trial that was rate limited, cancelled or otherwise left without a verdict
+                    # must not keep the breaker from letting the next call through
+                    if trial:
+                        breaker.cancel_trial()
+                await asyncio.sleep(delay)
+
+    async def edit_mute(self, member: discord.Member, mute: bool, reason: str, deadline: float = None) -> str:
+        """Request a member's server mute, returns "ok", "left" or "superseded"
+
+        deadline, for a mute, schedules a timed unmute at that time.time()
+        timestamp once the mute is applied. API errors are raised.
+        """
+        key = (member.guild.id, member.id)
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = self._slots[key] = _MemberSlot()
+            drain = asyncio.create_task(self._drain(key, member, slot))
+            self._drains.add(drain)
+            drain.add_done_callback(self._drains.discard)
+        slot.mute = mute
+        slot.reason = reason
+        # A later mute without a duration keeps an earlier request's timed unmute, an unmute clears it
+        if not mute:
+            slot.deadline = None
+            slot.clear_timer = True
+        elif deadline is not None:
+            slot.deadline = deadline
+        future = asyncio.get_running_loop().create_future()
+        slot.waiters.append((future, mute))
+        return await future
+
+    async def _drain(self, key, member: discord.Member, slot: _MemberSlot):
+        # Runs apart from the callers, so a cancelled caller can't strand the others
+        waiters = []
+        try:
+            while slot.waiters:
+                waiters, slot.waiters = slot.waiters, []
+                mute, reason, deadline, clear_timer = slot.mute, slot.reason, slot.deadline, slot.clear_timer
+                slot.deadline = None
+                slot.clear_timer = False
+                for future, requested in waiters:
+                    if requested != mute:
+                        if self.metrics:
+                            self.metrics.member_edits.inc("superseded")
+                        if not future.done():
+                            future.set_result("superseded")
+                try:
+                    status = await self._apply(key, member, mute, reason, deadline, clear_timer)
+                except Exception as e:
+                    for future, requested in waiters:
+                        if requested == mute and not future.done():
+                            future.set_exception(e)
+                    continue
+                for future, requested in waiters:
+                    if requested == mute and not future.done():
+                        future.set_result(status)
+        finally:
+            del self._slots[key]
+            for future, _ in waiters + slot.waiters:
+                if not future.done():
+                    future.cancel()
+
+    async def _apply(self, key, member: discord.Member, mute: bool, reason: str, deadline, clear_timer: bool) -> str:
+        # Members may leave voice while earlier edits are in flight
+        if not member.voice:
+            return "left"
+        current = member.voice.mute
+        applied = self._applied.get(key)
+        if applied is not None and time.monotonic() - applied[1] < APPLIED_GRACE:
+            current = applied[0]
+        if current != mute:
+            await self._send(member, mute, reason)
+            self._remember(key, mute)
+        elif self.metrics:
+            self.metrics.member_edits.inc("noop")
+
+        if self.scheduler is not None:
+            if deadline is not None:
+                self.scheduler.schedule(member.guild.id, member.id, deadline)
+            elif clear_timer:
+                if self.scheduler.cancel(member.guild.id, member.id):
+                    log.info("Cancelled timed unmute for %s.", member.display_name, extra={
+                        "guild": member.guild.id, "member": member.id,
+                    })
+        # Unmuting someone who isn't muted keeps its old meaning: already unmuted
+        return "ok" if mute or current else "left"
+
+    def _remember(self, key, mute: bool):
+        now = time.monotonic()
+        self._applied[key] = (mute, now)
+        # Forget expired entries so the table doesn't grow without bound
+        if len(self._applied) > 10000:
+            self._applied = {k: v for k, v in self._applied.items() if now - v[1] < APPLIED_GRACE}
+
+    async def edit_one(self, member: discord.Member, mute: bool, reason: str, deadline: float = None) -> MemberEditResult:
+        """Set one member's server mute, returning the outcome instead of raising"""
+        try:
+            return MemberEditResult(member, await self.edit_mute(member, mute, reason, deadline), None)
+        except discord.Forbidden as e:
+            return MemberEditResult(member, "forbidden", e)
+        except Exception as e:
+            return MemberEditResult(member, "error", e)
+
+    async def bulk_edit_mute(self, members, mute: bool, reason: str, on_result=None):
+        """Set server mute for many members concurrently
+
+        on_result, if given, is called with each MemberEditResult as it completes.
+        Returns a list of MemberEditResult in the same order as members.
+        """
+        async def edit(member):
+            result = await self.edit_one(member, mute, reason)
+            if on_result is not None:
+                on_result(result)
+            return result
+
+        return await asyncio.gather(*(edit(member) for member in members))
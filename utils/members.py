@@ -0,0 +1,47 @@
+import asyncio
+import discord
+
+# Gateway member requests accept at most 100 user IDs at a time
+QUERY_BATCH_SIZE = 100
+
+
+async def resolve_members(guild: discord.Guild, member_ids):
+    """Resolve member IDs to members, fetching any that aren't in the member cache
+
+    In lean member cache mode only voice participants are cached, so misses are
+    expected; they are looked up over the gateway in batches, and one by one
+    over HTTP for a batch the gateway doesn't answer in time. Members that
+    can't be found are skipped.
+    """
+    members = []
+    missing = []
+    for member_id in member_ids:
+        member = guild.get_member(member_id)
+        if member is not None:
+            members.append(member)
+        else:
+            missing.append(member_id)
+
+    if not missing:
+        return members
+
+    for i in range(0, len(missing), QUERY_BATCH_SIZE):
+        batch = missing[i:i + QUERY_BATCH_SIZE]
+        try:
+            # query_members returns at most 5 members unless told otherwise
+            members.extend(await guild.query_members(user_ids=batch, limit=len(batch), cache=False))
+        except asyncio.TimeoutError:
+            # The gateway didn't answer in time, fall back to HTTP for this batch
+            members.extend(await fetch_members(guild, batch))
+    return members
+
+
+async def fetch_members(guild: discord.Guild, member_ids):
+    """Fetch members one by one over HTTP, skipping any that can't be found"""
+    members = []
+    for member_id in member_ids:
+        try:
+            members.append(await guild.fetch_member(member_id))
+        except discord.NotFound:
+            pass
+    return members
@@ -0,0 +1,213 @@
+import asyncio
+import logging
+from bisect import bisect_left
+
+# Upper bounds in seconds, shared by the latency histograms
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{str(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    """Monotonic counter, optionally split by a fixed tuple of label names"""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        # key: label values tuple, value: [count]
+        self._values = {}
+
+    def inc(self, *labelvalues, amount=1):
+        cell = self._values.get(labelvalues)
+        if cell is None:
+            cell = self._values[labelvalues] = [0]
+        cell[0] += amount
+
+    def value(self, *labelvalues):
+        cell = self._values.get(labelvalues)
+        return cell[0] if cell else 0
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labelvalues, (count,) in sorted(self._values.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, labelvalues)} {count}")
+        return lines
+
+
+class Gauge:
+    """Point-in-time value read from a callback when metrics are scraped"""
+
+    def __init__(self, name, documentation, callback):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+
+    def render(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge",
+                f"{self.name} {self.callback()}"]
+
+
+class Histogram:
+    """Fixed-bucket histogram, optionally split by a fixed tuple of label names
+
+    Bucket counts are plain lists that are incremented in place, so observing a
+    value never allocates once a label combination has been seen.
+    """
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # key: label values tuple, value: [per-bucket counts..., +Inf count, sum]
+        self._values = {}
+
+    def observe(self, value, *labelvalues):
+        cell = self._values.get(labelvalues)
+        if cell is None:
+            cell = self._values[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0]
+        cell[bisect_left(self.buckets, value)] += 1
+        cell[-1] += value
+
+    def count(self, *labelvalues):
+        cell = self._values.get(labelvalues)
+        return sum(cell[:-1]) if cell else 0
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labelvalues, cell in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), cell[:-1]):
+                cumulative += count
+                labels = _labels(self.labelnames + ("le",), labelvalues + (bound,))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _labels(self.labelnames, labelvalues)
+            lines.append(f"{self.name}_sum{labels} {cell[-1]}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Metrics:
+    """All of the bot's metrics, rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self.command_latency = Histogram(
+            "bot_command_latency_seconds", "Time from command invocation to its final response", ("command",))
+        self.member_edits = Counter(
+            "bot_member_edits_total", "Member voice edits by outcome", ("outcome",))
+        self.rate_limit_waits = Counter(
+            "bot_rate_limit_waits_total", "Requests delayed by a 429 response")
+        self.rate_limit_wait_seconds = Counter(
+            "bot_rate_limit_wait_seconds_total", "Total time spent waiting out 429 responses")
+        self.edit_retries = Counter(
+            "bot_member_edit_retries_total", "Member edits retried after a 5xx response or network error")
+        self.unmute_lag = Histogram(
+            "bot_unmute_lag_seconds", "Delay between a timed unmute's deadline and it firing")
+        self._gauges = []
+
+    def gauge(self, name, documentation, callback):
+        self._gauges.append(Gauge(name, documentation, callback))
+
+    def record_edit(self, error=None):
+        """Count a member edit outcome: success, forbidden, http_<status> or error"""
+        if error is None:
+            self.member_edits.inc("success")
+        elif getattr(error, "status", None) == 403:
+            self.member_edits.inc("forbidden")
+        elif isinstance(getattr(error, "status", None), int):
+            self.member_edits.inc(f"http_{error.status}")
+        else:
+            self.member_edits.inc("error")
+
+    def render(self):
+        lines = []
+        for metric in (self.command_latency, self.member_edits, self.rate_limit_waits,
+                       self.rate_limit_wait_seconds, self.edit_retries, self.unmute_lag, *self._gauges):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class RateLimitLogHandler(logging.Handler):
+    """Counts the 429 waits discord.py handles internally, which it only reports through logging"""
+
+    PREFIX = "We are being rate limited."
+
+    def __init__(self, metrics):
+        super().__init__(logging.WARNING)
+        self.metrics = metrics
+        self._logger_level = None
+
+    def emit(self, record):
+        # Format: 'We are being rate limited. %s %s responded with 429. Retrying in %.2f seconds.'
+        if isinstance(record.msg, str) and record.msg.startswith(self.PREFIX) and "Retrying in" in record.msg:
+            self.metrics.rate_limit_waits.inc()
+            self.metrics.rate_limit_wait_seconds.inc(amount=record.args[-1])
+
+    @classmethod
+    def install(cls, metrics):
+        handler = cls(metrics)
+        logger = logging.getLogger("discord.http")
+        # The warnings must reach this handler whatever LOG_LEVEL is; the log
+        # output is filtered by the level of setup_logging's handler instead
+        if logger.getEffectiveLevel() > logging.WARNING:
+            handler._logger_level = logger.level
+            logger.setLevel(logging.WARNING)
+        logger.addHandler(handler)
+        return handler
+
+    def uninstall(self):
+        logger = logging.getLogger("discord.http")
+        logger.removeHandler(self)
+        if self._logger_level is not None:
+            logger.setLevel(self._logger_level)
+            self._logger_level = None
+
+
+class MetricsServer:
+    """Minimal HTTP server answering every GET with the current metrics
+
+    Rendering happens on scrape only, so recording stays a counter increment.
+    """
+
+    def __init__(self, metrics, host="127.0.0.1", port=9100):
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self._server = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader, writer):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), 5)
+            # Drain the request headers
+            while (await asyncio.wait_for(reader.readline(), 5)) not in (b"\r\n", b"\n", b""):
+                pass
+            if request_line.split(b" ")[:1] == [b"GET"]:
+                body = self.metrics.render().encode("utf-8")
+                status = b"200 OK"
+            else:
+                body = b"Method Not Allowed\n"
+                status = b"405 Method Not Allowed"
+            writer.write(b"HTTP/1.1 " + status + b"\r\n"
+                         b"Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                         b"Content-Length: " + str(len(body)).encode() + b"\r\n"
+                         b"Connection: close\r\n\r\n" + body)
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
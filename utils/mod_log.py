@@ -0,0 +1,264 @@
+import asyncio
+import contextlib
+import logging
+import mmap
+import os
+import re
+import struct
+import time
+
+log = logging.getLogger(__name__)
+
+DEFAULT_MOD_LOG_DIR = os.path.join("data", "mod_log")
+# The active segment is sealed and a new one started once it reaches this size
+DEFAULT_SEGMENT_SIZE = 1024 * 1024
+# Oldest segments are deleted beyond this many, about 28k events each at the default size
+DEFAULT_MAX_SEGMENTS = 512
+# Buffered events are written once this many are waiting, or every FLUSH_INTERVAL seconds
+BATCH_SIZE = 256
+FLUSH_INTERVAL = 1.0
+
+ACTIONS = ("mute", "unmute", "expire")
+MAX_DURATION = 2 ** 32 - 1
+
+# guild_id, target_id, actor_id, action, duration (seconds, 0 for none), timestamp. Big-endian,
+# so sorted index records compare bytewise by (guild_id, target_id).
+RECORD = struct.Struct(">QQQBId")
+KEY = struct.Struct(">QQ")
+
+SEGMENT_PATTERN = re.compile(r"segment-(\d+)\.log")
+
+
+class ModEvent:
+    """One mute, unmute or expired timed mute"""
+
+    __slots__ = ("guild_id", "target_id", "actor_id", "action", "duration", "timestamp")
+
+    def __init__(self, guild_id, target_id, actor_id, action, duration, timestamp):
+        self.guild_id = guild_id
+        self.target_id = target_id
+        self.actor_id = actor_id
+        self.action = action
+        self.duration = duration
+        self.timestamp = timestamp
+
+    @property
+    def action_name(self):
+        return ACTIONS[self.action]
+
+    def pack(self):
+        return RECORD.pack(self.guild_id, self.target_id, self.actor_id, self.action, self.duration, self.timestamp)
+
+    @classmethod
+    def unpack_all(cls, data):
+        return [cls(*fields) for fields in RECORD.iter_unpack(data)]
+
+
+class ModLog:
+    """Append-only moderation history in fixed-size records
+
+    Events are buffered and appended in batches to the active segment file by
+    a worker thread, so disk writes and fsyncs never block the event loop.
+    Once the segment reaches segment_size it is sealed: a sorted copy of its records is
+    written next to it as an index, so a (guild, target) lookup is a binary
+    search per segment. Only the active segment's events are kept in memory,
+    and segments beyond max_segments are deleted, so memory stays bounded by
+    the segment size and disk by the segment count.
+    """
+
+    def __init__(self, directory: str = DEFAULT_MOD_LOG_DIR, segment_size: int = DEFAULT_SEGMENT_SIZE,
+                 max_segments: int = DEFAULT_MAX_SEGMENTS, batch_size: int = BATCH_SIZE):
+        self.directory = directory
+        self.segment_size = max(RECORD.size, segment_size)
+        self.max_segments = max(1, max_segments)
+        self.batch_size = max(1, batch_size)
+        os.makedirs(directory, exist_ok=True)
+        # Events not yet written to the active segment
+        self._pending = []
+        # key: (guild_id, target_id), value: that target's events in the active segment, oldest first
+        self._active = {}
+        self._sealed = []
+        self._task = None
+        self._closing = False
+        # Set to flush early once a full batch is waiting
+        self._wake = asyncio.Event()
+        # One flush at a time; the file and segment number are only touched by the flush's worker thread
+        self._lock = asyncio.Lock()
+        self._open()
+
+    def __len__(self):
+        """Events in memory, i.e. in the active segment"""
+        return sum(len(events) for events in self._active.values())
+
+    def _path(self, number, suffix="log"):
+        return os.path.join(self.directory, f"segment-{number:08d}.{suffix}")
+
+    def _open(self):
+        numbers = sorted(int(match.group(1)) for match in map(SEGMENT_PATTERN.fullmatch, os.listdir(self.directory)) if match)
+        unsealed = [number for number in numbers if not os.path.exists(self._path(number, "idx"))]
+        if unsealed and unsealed[-1] == numbers[-1]:
+            self._number = unsealed.pop()
+        else:
+            self._number = (numbers[-1] if numbers else 0) + 1
+        # Segments left unsealed by a crash during rotation
+        for number in unsealed:
+            self._seal(number, self._read(number))
+        self._sealed = [number for number in numbers if number != self._number]
+        self._prune()
+
+        for event in self._read(self._number):
+            self._active.setdefault((event.guild_id, event.target_id), []).append(event)
+        self._file = open(self._path(self._number), "ab")
+
+    def _read(self, number):
+        """Read a segment's events, dropping a record cut short by a crash"""
+        path = self._path(number)
+        if not os.path.exists(path):
+            return []
+        with open(path, "rb") as f:
+            data = f.read()
+        usable = len(data) - len(data) % RECORD.size
+        if usable != len(data):
+            log.warning("Dropping a partial record at the end of %s", path)
+            with open(path, "r+b") as f:
+                f.truncate(usable)
+        return ModEvent.unpack_all(data[:usable])
+
+    def _seal(self, number, events):
+        events = sorted(events, key=lambda event: (event.guild_id, event.target_id, event.timestamp))
+        temp_path = self._path(number, "idx.tmp")
+        with open(temp_path, "wb") as f:
+            f.write(b"".join(event.pack() for event in events))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self._path(number, "idx"))
+
+    def _expire(self):
+        """Drop the oldest sealed segments beyond max_segments from the list, returns their numbers"""
+        expired, self._sealed = self._sealed[:-self.max_segments], self._sealed[-self.max_segments:]
+        return expired
+
+    def _remove(self, numbers):
+        for number in numbers:
+            for suffix in ("log", "idx"):
+                os.remove(self._path(number, suffix))
+
+    def _prune(self):
+        self._remove(self._expire())
+
+    def record(self, guild_id: int, target_id: int, actor_id: int, action: str, duration: float = 0, timestamp: float = None):
+        """Log an event; action is one of ACTIONS and duration is in seconds
+
+        The event is only buffered here, the background flush writes it.
+        """
+        event = ModEvent(guild_id, target_id, actor_id, ACTIONS.index(action), min(int(duration or 0), MAX_DURATION),
+                         time.time() if timestamp is None else timestamp)
+        self._pending.append(event)
+        self._active.setdefault((guild_id, target_id), []).append(event)
+        if len(self._pending) >= self.batch_size:
+            self._wake.set()
+
+    async def flush(self):
+        """Write buffered events in a worker thread, sealing the active segment whenever it fills"""
+        async with self._lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, []
+            try:
+                sealed, sealed_events = await asyncio.to_thread(self._write, batch)
+            except OSError:
+                # Kept for the next flush
+                self._pending[:0] = batch
+                raise
+            if not sealed:
+                return
+            # The sealed segments' events are now found through their indexes; keep the rest of
+            # the batch and anything recorded while it was being written
+            self._sealed.extend(sealed)
+            self._active = {}
+            for event in batch[sealed_events:] + self._pending:
+                self._active.setdefault((event.guild_id, event.target_id), []).append(event)
+            expired = self._expire()
+            if expired:
+                await asyncio.to_thread(self._remove, expired)
+
+    def _write(self, events):
+        """Append events to the active segment, sealing it and starting the next one whenever it fills
+
+        Runs in a worker thread. Returns the numbers of the segments it sealed
+        and how many of the events went into them.
+        """
+        sealed = []
+        sealed_events = 0
+        written = 0
+        while written < len(events):
+            # Records that still fit in the active segment, at least one
+            room = max(1, -(-(self.segment_size - self._file.tell()) // RECORD.size))
+            chunk = events[written:written + room]
+            self._file.write(b"".join(event.pack() for event in chunk))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            written += len(chunk)
+            if self._file.tell() >= self.segment_size:
+                self._file.close()
+                self._seal(self._number, self._read(self._number))
+                sealed.append(self._number)
+                sealed_events = written
+                self._number += 1
+                self._file = open(self._path(self._number), "ab")
+        return sealed, sealed_events
+
+    def history(self, guild_id: int, target_id: int, limit: int = 10):
+        """Return a member's latest events in a guild, newest first"""
+        events = self._active.get((guild_id, target_id), [])[::-1][:limit]
+        for number in reversed(self._sealed):
+            if len(events) >= limit:
+                break
+            events.extend(self._lookup(number, guild_id, target_id)[::-1][:limit - len(events)])
+        return events
+
+    def _lookup(self, number, guild_id, target_id):
+        """Binary search a sealed segment's index for one target's events, oldest first"""
+        key = KEY.pack(guild_id, target_id)
+        with open(self._path(number, "idx"), "rb") as f:
+            if os.fstat(f.fileno()).st_size < RECORD.size:
+                return []
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as index:
+                size = RECORD.size
+                low, high = 0, len(index) // size
+                while low < high:
+                    middle = (low + high) // 2
+                    if index[middle * size:middle * size + KEY.size] < key:
+                        low = middle + 1
+                    else:
+                        high = middle
+                end = low
+                while end * size < len(index) and index[end * size:end * size + KEY.size] == key:
+                    end += 1
+                return ModEvent.unpack_all(index[low * size:end * size])
+
+    def start(self, interval: float = FLUSH_INTERVAL):
+        """Flush buffered events every interval seconds in the background"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(interval))
+
+    async def _run(self, interval):
+        while not self._closing:
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wake.wait(), interval)
+            self._wake.clear()
+            try:
+                await self.flush()
+            except OSError:
+                log.exception("Error writing moderation log")
+
+    async def close(self):
+        """Stop the background flush, write the remaining events and close the active segment"""
+        if self._task is not None:
+            # Not cancelled, so a write in progress in the worker thread finishes first
+            self._closing = True
+            self._wake.set()
+            await self._task
+            self._task = None
+        await self.flush()
+        self._file.close()
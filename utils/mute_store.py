@@ -0,0 +1,85 @@
+import os
+import sqlite3
+
+from utils.coordination import CoordinationBackend
+
+DEFAULT_STORE_PATH = os.path.join("data", "timed_mutes.db")
+
+
+class MuteStore(CoordinationBackend):
+    """SQLite-backed record of pending timed unmutes
+
+    Rows are (guild_id, member_id, deadline) with deadline as a time.time()
+    timestamp. The database runs in WAL mode with synchronous=NORMAL, so single
+    row writes from commands stay cheap while surviving crashes and restarts.
+    Nothing in here touches Discord, so it can be exercised on its own.
+
+    Cluster workers on one host can share the file as their coordination
+    backend; SQLite serializes their writes.
+    """
+
+    def __init__(self, path: str = DEFAULT_STORE_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS timed_mutes ("
+            " guild_id INTEGER NOT NULL,"
+            " member_id INTEGER NOT NULL,"
+            " deadline REAL NOT NULL,"
+            " PRIMARY KEY (guild_id, member_id)"
+            ") WITHOUT ROWID"
+        )
+        self._conn.commit()
+
+    def add(self, guild_id: int, member_id: int, deadline: float):
+        """Record (or replace) a pending unmute"""
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO timed_mutes (guild_id, member_id, deadline) VALUES (?, ?, ?)",
+                (guild_id, member_id, deadline),
+            )
+
+    def add_many(self, records):
+        """Record many (guild_id, member_id, deadline) rows in one transaction"""
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO timed_mutes (guild_id, member_id, deadline) VALUES (?, ?, ?)",
+                records,
+            )
+
+    def remove(self, guild_id: int, member_id: int):
+        """Forget a pending unmute"""
+        with self._conn:
+            self._conn.execute(
+                "DELETE FROM timed_mutes WHERE guild_id = ? AND member_id = ?",
+                (guild_id, member_id),
+            )
+
+    def remove_many(self, keys):
+        """Forget many (guild_id, member_id) pending unmutes in one transaction"""
+        with self._conn:
+            self._conn.executemany(
+                "DELETE FROM timed_mutes WHERE guild_id = ? AND member_id = ?",
+                keys,
+            )
+
+    def load_all(self):
+        """Return every pending (guild_id, member_id, deadline) row"""
+        return self._conn.execute("SELECT guild_id, member_id, deadline FROM timed_mutes").fetchall()
+
+    def load_shards(self, shard_ids, shard_count: int):
+        """Return the rows for guilds on the given shards"""
+        shard_ids = list(shard_ids)
+        placeholders = ", ".join("?" * len(shard_ids))
+        return self._conn.execute(
+            f"SELECT guild_id, member_id, deadline FROM timed_mutes WHERE (guild_id >> 22) % ? IN ({placeholders})",
+            (shard_count, *shard_ids),
+        ).fetchall()
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import time
+from collections import Counter
+
+import discord
+
+log = logging.getLogger(__name__)
+
+# Discord's message content limit
+MESSAGE_LIMIT = 2000
+# Detail lines that don't fit in this many messages are summarized as a count
+MAX_REPORT_PAGES = 3
+
+# Shown in the final report's breakdown line, in this order
+STATUS_LABELS = (
+    ("forbidden", "❌ {} no permission"),
+    ("error", "⚠️ {} failed"),
+    ("left", "ℹ️ {} left voice or already changed"),
+    ("superseded", "🔁 {} overridden by another command"),
+)
+
+
+def paginate(lines, limit=MESSAGE_LIMIT):
+    """Pack lines into as few messages of at most limit characters as possible"""
+    pages = []
+    current = ""
+    for line in lines:
+        line = line[:limit]
+        if current and len(current) + 1 + len(line) > limit:
+            pages.append(current)
+            current = line
+        else:
+            current = f"{current}\n{line}" if current else line
+    if current:
+        pages.append(current)
+    return pages
+
+
+class BulkProgress:
+    """Live progress of a bulk member edit, shown in the interaction's original response
+
+    Results are only counted as they arrive; the message is edited at most once
+    per interval, and not at all if the operation finishes before the first
+    update is due. finish() then replaces it with the final report.
+    """
+
+    def __init__(self, interaction: discord.Interaction, title: str, total: int, interval=1.5, first_update=0.5):
+        self.interaction = interaction
+        self.title = title
+        self.total = total
+        self.interval = interval
+        self.first_update = first_update
+        self.counts = Counter()
+        self._task = None
+        self._editing = False
+        self._edited = False
+        self._finished = False
+        self._last_edit = 0.0
+
+    @property
+    def done(self):
+        return sum(self.counts.values())
+
+    def start(self):
+        self._task = asyncio.create_task(self._update_after(self.first_update))
+
+    def add(self, result):
+        """Count a MemberEditResult, used as bulk_edit_mute's on_result callback"""
+        self.counts[result.status] += 1
+        if self._task is None and not self._finished:
+            delay = max(0.0, self._last_edit + self.interval - time.monotonic())
+            self._task = asyncio.create_task(self._update_after(delay))
+
+    def status_line(self):
+        failed = self.done - self.counts["ok"]
+        return f"⏳ {self.title}: {self.done}/{self.total} processed, {self.counts['ok']} successful, {failed} not changed."
+
+    async def _update_after(self, delay):
+        try:
+            await asyncio.sleep(delay)
+            self._editing = True
+            self._last_edit = time.monotonic()
+            await self.interaction.edit_original_response(content=self.status_line())
+            self._edited = True
+        except discord.HTTPException as e:
+            log.warning("Could not update progress message: %s", e, extra={"guild": self.interaction.guild_id})
+        finally:
+            self._editing = False
+            self._task = None
+
+    def report_pages(self, summary, details):
+        """The final report: summary, per-status breakdown and as many details as fit"""
+        head = [summary]
+        breakdown = [label.format(self.counts[status]) for status, label in STATUS_LABELS if self.counts[status]]
+        if breakdown:
+            head.append(" · ".join(breakdown))
+        if not details:
+            return paginate(head)
+        head.append("**Details:**")
+        pages = paginate(head + details)
+        shown = len(details)
+        while len(pages) > MAX_REPORT_PAGES:
+            # Trim to what the first pages hold, then until the "more" line fits too
+            shown = min(shown - 1, sum(page.count("\n") + 1 for page in pages[:MAX_REPORT_PAGES]) - len(head))
+            pages = paginate(head + details[:shown] + [f"…and {len(details) - shown} more."])
+        return pages
+
+    async def finish(self, summary: str, details=()):
+        """Replace the progress message with the final report, sending extra pages as followups"""
+        self._finished = True
+        if self._task is not None:
+            # Let an edit already in flight land first so it can't overwrite the report
+            if self._editing:
+                await self._task
+            else:
+                self._task.cancel()
+        pages = self.report_pages(summary, list(details))
+        if self._edited:
+            await self.interaction.edit_original_response(content=pages[0])
+        else:
+            await self.interaction.followup.send(pages[0], ephemeral=True)
+        for page in pages[1:]:
+            await self.interaction.followup.send(page, ephemeral=True)
@@ -0,0 +1,99 @@
+import asyncio
+import random
+import time
+
+import aiohttp
+import discord
+
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_COOLDOWN = 30.0
+MAX_COOLDOWN = 300.0
+
+
+def is_transient(error: Exception) -> bool:
+    """Whether a failed request is worth retrying: 429s, 5xx responses and network errors"""
+    if isinstance(error, discord.HTTPException):
+        return error.status == 429 or error.status >= 500
+    return isinstance(error, (aiohttp.ClientError, asyncio.TimeoutError, OSError))
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 10.0) -> float:
+    """Exponential backoff with full jitter, so retries from many edits don't arrive in lockstep"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling Discord while a guild's circuit breaker is open"""
+
+    def __init__(self, retry_in: float):
+        super().__init__(f"Member edits are paused for {retry_in:.0f}s after repeated Discord failures")
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """Stops member edits for one guild while Discord keeps failing them
+
+    Closed, calls go through and consecutive transient failures are counted.
+    After threshold of them the breaker opens and calls fail fast with
+    CircuitOpenError for cooldown seconds. Then it is half-open: one trial call
+    goes through, success closes the breaker and failure opens it again for
+    twice as long, up to max_cooldown.
+    """
+
+    def __init__(self, threshold=DEFAULT_FAILURE_THRESHOLD, cooldown=DEFAULT_COOLDOWN, max_cooldown=MAX_COOLDOWN):
+        self.threshold = max(1, threshold)
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.failures = 0
+        self._opened_at = None
+        self._current_cooldown = cooldown
+        self._trial = False
+
+    @property
+    def state(self) -> str:
+        """One of closed, open or half-open"""
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self._current_cooldown:
+            return "half-open"
+        return "open"
+
+    def retry_in(self) -> float:
+        """Seconds until the breaker lets a trial call through"""
+        if self._opened_at is None:
+            return 0.0
+        return max(0.0, self._opened_at + self._current_cooldown - time.monotonic())
+
+    def before_call(self) -> bool:
+        """Raise CircuitOpenError unless a call may go through now
+
+        Returns True if this call is the half-open trial. Its caller must end
+        the trial with record_success, record_failure or cancel_trial.
+        """
+        state = self.state
+        if state == "open" or (state == "half-open" and self._trial):
+            raise CircuitOpenError(self.retry_in() or self._current_cooldown)
+        if state == "half-open":
+            self._trial = True
+            return True
+        return False
+
+    def record_success(self):
+        """Discord answered, even if it refused the request"""
+        self.failures = 0
+        self._opened_at = None
+        self._current_cooldown = self.cooldown
+        self._trial = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self._trial:
+            self._trial = False
+            self._opened_at = time.monotonic()
+            self._current_cooldown = min(self._current_cooldown * 2, self.max_cooldown)
+        elif self._opened_at is None and self.failures >= self.threshold:
+            self._opened_at = time.monotonic()
+
+    def cancel_trial(self):
+        """Let another call make the trial if this one ended without a verdict, e.g. cancelled or rate limited"""
+        self._trial = False
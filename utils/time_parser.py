@@ -1,29 +1,92 @@
 import re
 from datetime import timedelta
+from functools import lru_cache
 
-def parse_duration(duration_str: str) -> timedelta | None:
+# 各单位对应的秒数
+UNIT_SECONDS = {"w": 604800, "d": 86400, "h": 3600, "m": 60, "s": 1}
+# 整个字符串由一个或多个 "数字+单位" 组成，单位之间可以有空格，如 "1h30m"、"1h 30m"
+DURATION_PATTERN = re.compile(r"(?:\d+\s*[wdhms]\s*)+")
+TOKEN_PATTERN = re.compile(r"(\d+)\s*([wdhms])")
+# 超过此长度的输入直接视为无效，既限制解析开销，也限制缓存占用
+MAX_INPUT_LENGTH = 32
+# 解析结果的绝对上限，防止超大数值导致 timedelta 溢出；业务上限由调用方另行配置
+MAX_PARSED = timedelta(days=36500)
+
+@lru_cache(maxsize=4096)
+def _parse_seconds(duration_str: str) -> int | None:
+    """解析已规范化（小写、去除首尾空格）的时间字符串，返回总秒数，失败返回None"""
+    if len(duration_str) > MAX_INPUT_LENGTH or not DURATION_PATTERN.fullmatch(duration_str):
+        return None
+    total = sum(int(value) * UNIT_SECONDS[unit] for value, unit in TOKEN_PATTERN.findall(duration_str))
+    if total > MAX_PARSED.total_seconds():
+        return None
+    return total
+
+def parse_duration(duration_str: str, max_duration: timedelta | None = None) -> timedelta | None:
     """
-    解析时间字符串，如 "30s", "5m", "1h", "1d"。
-    返回一个timedelta对象，解析失败则返回None。
-    
+    解析时间字符串，如 "30s", "5m", "1h", "1d", "2w"，也支持组合形式如 "1h30m"、"1d 12h"。
+    结果会被缓存，重复解析（例如自动补全时）无需再次匹配正则。
+    返回一个timedelta对象，解析失败或超过 max_duration 则返回None。
+
     Args:
-        duration_str: 时间字符串，如 "30s", "5m", "1h", "1d"
-        
+        duration_str: 时间字符串，如 "30s", "5m", "1h30m", "2w"
+        max_duration: 允许的最大时长（可选）
+
     Returns:
         timedelta: 转换后的时间间隔对象，失败则返回None
     """
-    match = re.fullmatch(r"(\d+)([smhd])", duration_str.lower())
-    if not match:
+    seconds = _parse_seconds(duration_str.strip().lower())
+    if seconds is None:
+        return None
+    delta = timedelta(seconds=seconds)
+    if max_duration is not None and delta > max_duration:
         return None
-    
-    value, unit = int(match.group(1)), match.group(2)
-    
-    if unit == 's':
-        return timedelta(seconds=value)
-    elif unit == 'm':
-        return timedelta(minutes=value)
-    elif unit == 'h':
-        return timedelta(hours=value)
-    elif unit == 'd':
-        return timedelta(days=value)
-    return None  # 按照正则表达式不应该进入这里，但作为良好实践保留
\ No newline at end of file
+    return delta
+
+def format_duration(seconds: int, parts: int | None = 2) -> str:
+    """
+    将秒数格式化为紧凑的时间字符串，如 3600 -> "1h"，5400 -> "1h30m"。
+    输出可以被 parse_duration 重新解析；parts 限制最多保留的单位数（None 表示全部保留）。
+    """
+    seconds = int(seconds)
+    tokens = []
+    for unit, size in UNIT_SECONDS.items():
+        if seconds >= size:
+            tokens.append(f"{seconds // size}{unit}")
+            seconds %= size
+    return "".join(tokens[:parts]) or "0s"
+
+# /mute 的默认最大静音时长，可通过 MAX_MUTE_DURATION 配置
+DEFAULT_MAX_MUTE_DURATION = "28d"
+# 输入为空时自动补全给出的常用时长
+DURATION_PRESETS = ("5m", "15m", "30m", "1h", "2h", "6h", "12h", "1d", "3d", "1w")
+TRAILING_NUMBER = re.compile(r"(.*?)(\d+)")
+
+@lru_cache(maxsize=4096)
+def suggest_durations(current: str, max_seconds: int, limit: int = 25) -> tuple:
+    """
+    根据用户正在输入的内容给出时长补全建议，如 "1h3" -> "1h3m", "1h3s"。
+    只返回能被 parse_duration 解析且不超过 max_seconds 的正数时长，结果会被缓存。
+
+    Returns:
+        tuple: (时长字符串, 秒数) 组成的元组
+    """
+    text = "".join(current.lower().split())
+    candidates = list(DURATION_PRESETS) if not text else [text]
+    match = TRAILING_NUMBER.fullmatch(text)
+    if match:
+        # 输入以数字结尾时补上单位（从小到大），只补比前一个单位更小的单位
+        prefix = match.group(1)
+        units = list(UNIT_SECONDS)
+        if prefix and prefix[-1] not in UNIT_SECONDS:
+            # 如 "x5"、"1.5"，前面的内容不是合法时长，补全单位也无法解析
+            return ()
+        smaller = units[units.index(prefix[-1]) + 1:] if prefix else units
+        candidates = [text + unit for unit in reversed(smaller)]
+
+    suggestions = []
+    for candidate in candidates:
+        seconds = _parse_seconds(candidate)
+        if seconds and seconds <= max_seconds and candidate not in (value for value, _ in suggestions):
+            suggestions.append((candidate, seconds))
+    return tuple(suggestions[:limit])
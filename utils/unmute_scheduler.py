@@ -0,0 +1,165 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+
+log = logging.getLogger(__name__)
+
+
+class UnmuteScheduler:
+    """Single-task scheduler for timed unmutes
+
+    Entries are compact [deadline, seq, guild_id, member_id] lists kept in a heap.
+    Cancelling marks an entry dead instead of removing it from the heap, so
+    schedule, reschedule and cancel are all O(log n) or better. Deadlines are
+    wall-clock timestamps (time.time()) so they survive being persisted.
+
+    Expired entries are handed to the handler in batches of (guild_id, member_id)
+    keys. While no handler is set (e.g. the owning cog is being reloaded),
+    expired entries are kept and fired once a handler is set again.
+
+    If a store is given, every schedule and cancel is mirrored to it and fired
+    entries are removed from it once their batch has been handled.
+    """
+
+    def __init__(self, handler=None, store=None, metrics=None):
+        self.handler = handler
+        self.store = store
+        self.metrics = metrics
+        self._heap = []
+        # key: (guild_id, member_id), value: live heap entry
+        self._entries = {}
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task = None
+        # Strong references to running handler batches
+        self._batches = set()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def set_handler(self, handler):
+        """Set the coroutine function called with each batch of expired keys"""
+        self.handler = handler
+        self._wakeup.set()
+
+    def deadline(self, guild_id: int, member_id: int):
+        """Return the scheduled unmute timestamp for a member, or None"""
+        entry = self._entries.get((guild_id, member_id))
+        return entry[0] if entry else None
+
+    def load(self):
+        """Schedule every pending unmute from the store in one pass
+
+        Overdue entries fire in a single batch as soon as the runner starts.
+        Returns the number of entries loaded.
+        """
+        records = self.store.load_all()
+        for guild_id, member_id, deadline in records:
+            key = (guild_id, member_id)
+            old = self._entries.get(key)
+            if old is not None:
+                old[2] = None
+            entry = [deadline, next(self._counter), guild_id, member_id]
+            self._entries[key] = entry
+            self._heap.append(entry)
+        heapq.heapify(self._heap)
+        self._wakeup.set()
+        return len(records)
+
+    def schedule(self, guild_id: int, member_id: int, deadline: float):
+        """Schedule (or reschedule) an unmute at the given timestamp"""
+        if self.store is not None:
+            self.store.add(guild_id, member_id, deadline)
+        key = (guild_id, member_id)
+        old = self._entries.get(key)
+        if old is not None:
+            old[2] = None
+            self._maybe_compact()
+        entry = [deadline, next(self._counter), guild_id, member_id]
+        self._entries[key] = entry
+        heapq.heappush(self._heap, entry)
+        # Only wake the runner if this entry is now the earliest one
+        if self._heap[0] is entry:
+            self._wakeup.set()
+
+    def cancel(self, guild_id: int, member_id: int) -> bool:
+        """Cancel a pending unmute, returns whether one existed"""
+        entry = self._entries.pop((guild_id, member_id), None)
+        if entry is None:
+            return False
+        if self.store is not None:
+            self.store.remove(guild_id, member_id)
+        entry[2] = None
+        self._maybe_compact()
+        return True
+
+    def _maybe_compact(self):
+        # Rebuild the heap once cancelled entries outnumber live ones
+        if len(self._heap) > 2 * len(self._entries) + 64:
+            self._heap = [entry for entry in self._heap if entry[2] is not None]
+            heapq.heapify(self._heap)
+
+    def _pop_due(self, now: float):
+        due = []
+        heap = self._heap
+        while heap and (heap[0][2] is None or heap[0][0] <= now):
+            deadline, _, guild_id, member_id = heapq.heappop(heap)
+            if guild_id is None:
+                continue
+            if self.metrics:
+                self.metrics.unmute_lag.observe(now - deadline)
+            del self._entries[(guild_id, member_id)]
+            due.append((guild_id, member_id))
+        return due
+
+    def _next_deadline(self):
+        heap = self._heap
+        while heap and heap[0][2] is None:
+            heapq.heappop(heap)
+        return heap[0][0] if heap else None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            deadline = self._next_deadline() if self.handler else None
+            timeout = None if deadline is None else max(0.0, deadline - time.time())
+            if timeout is None or timeout > 0:
+                # asyncio.wait rather than wait_for, which can swallow cancellation on older Pythons
+                waiter = asyncio.ensure_future(self._wakeup.wait())
+                try:
+                    done, _ = await asyncio.wait((waiter,), timeout=timeout)
+                finally:
+                    waiter.cancel()
+                if done:
+                    continue
+
+            due = self._pop_due(time.time())
+            if due:
+                # Run the batch separately so a slow batch doesn't delay later deadlines
+                batch = asyncio.create_task(self._fire(due))
+                self._batches.add(batch)
+                batch.add_done_callback(self._batches.discard)
+
+    async def _fire(self, due):
+        try:
+            await self.handler(due)
+        except Exception:
+            log.exception("Error processing %d timed unmutes", len(due))
+        if self.store is not None:
+            # Members muted again while the batch ran have a fresh record to keep
+            self.store.remove_many([key for key in due if key not in self._entries])
+
@@ -0,0 +1,85 @@
+class VoiceStateIndex:
+    """Incremental index of who is server-muted in which voice channel
+
+    Layout is guild_id -> channel_id -> (muted member IDs, unmuted member IDs),
+    plus guild_id -> member_id -> channel_id to find a member's previous
+    channel in O(1). It is kept current from on_voice_state_update, so commands
+    can find the members they need to touch without scanning whole channels.
+    Pending timed unmutes are answered from the unmute scheduler.
+    """
+
+    def __init__(self, scheduler=None):
+        self.scheduler = scheduler
+        self._channels = {}
+        self._locations = {}
+
+    def _discard(self, guild_id: int, member_id: int):
+        channel_id = self._locations.get(guild_id, {}).pop(member_id, None)
+        if channel_id is None:
+            return
+        channels = self._channels[guild_id]
+        muted, unmuted = channels[channel_id]
+        muted.discard(member_id)
+        unmuted.discard(member_id)
+        if not muted and not unmuted:
+            del channels[channel_id]
+
+    def update(self, guild_id: int, member_id: int, channel_id, mute: bool):
+        """Record a member's current voice channel (None if disconnected) and server mute"""
+        self._discard(guild_id, member_id)
+        if channel_id is None:
+            return
+        muted, unmuted = self._channels.setdefault(guild_id, {}).setdefault(channel_id, (set(), set()))
+        (muted if mute else unmuted).add(member_id)
+        self._locations.setdefault(guild_id, {})[member_id] = channel_id
+
+    def rebuild_guild(self, guild):
+        """Replace a guild's entries with the voice states in the library cache"""
+        self.remove_guild(guild.id)
+        for channel in guild.voice_channels + guild.stage_channels:
+            for member_id, state in channel.voice_states.items():
+                self.update(guild.id, member_id, channel.id, state.mute)
+
+    def remove_guild(self, guild_id: int):
+        self._channels.pop(guild_id, None)
+        self._locations.pop(guild_id, None)
+
+    def muted_in(self, guild_id: int, channel_id: int):
+        """Return the set of server-muted member IDs in a channel"""
+        return self._channels.get(guild_id, {}).get(channel_id, (set(), set()))[0]
+
+    def unmuted_in(self, guild_id: int, channel_id: int):
+        """Return the set of member IDs in a channel who are not server-muted"""
+        return self._channels.get(guild_id, {}).get(channel_id, (set(), set()))[1]
+
+    def channels(self, guild_id: int):
+        """Return channel_id -> (muted, unmuted) for every occupied channel in a guild"""
+        return self._channels.get(guild_id, {})
+
+    def pending_in(self, guild_id: int, channel_id: int):
+        """Return muted member IDs in a channel that have a timed unmute pending"""
+        if self.scheduler is None:
+            return set()
+        return {member_id for member_id in self.muted_in(guild_id, channel_id) if (guild_id, member_id) in self.scheduler}
+
+    def check_consistency(self, guild):
+        """Compare a guild's entries with the library cache, returns a list of mismatches"""
+        expected = {}
+        for channel in guild.voice_channels + guild.stage_channels:
+            for member_id, state in channel.voice_states.items():
+                expected[member_id] = (channel.id, state.mute)
+
+        actual = {}
+        for channel_id, (muted, unmuted) in self.channels(guild.id).items():
+            for member_id in muted:
+                actual[member_id] = (channel_id, True)
+            for member_id in unmuted:
+                actual[member_id] = (channel_id, False)
+
+        mismatches = []
+        for member_id in expected.keys() | actual.keys():
+            if expected.get(member_id) != actual.get(member_id):
+                mismatches.append(f"Member {member_id}: cache {expected.get(member_id)}, index {actual.get(member_id)}")
+        if self._locations.get(guild.id, {}) != {member_id: channel_id for member_id, (channel_id, _) in actual.items()}:
+            mismatches.append("Member location map is out of sync with channel sets")
+        return mismatches